@@ -1,25 +1,120 @@
-from flask import Flask, render_template, request, redirect, session, flash, jsonify
-from flask_mysqldb import MySQL
+from flask import Flask, render_template, request, redirect, session, flash, jsonify, Response, g, has_app_context, stream_with_context
+from bisect import bisect_left, insort
 from collections import defaultdict
-import MySQLdb.cursors
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.utils import secure_filename
+from werkzeug.middleware.proxy_fix import ProxyFix
+import click
 import pandas as pd
 import numpy as np
+from db import Database
+from metrics import Metrics
+from auth import HasherBusy, PasswordHasher, RateLimiter
+from cache import create_cache
+from snapshots import SNAPSHOT_COLUMNS, create_snapshot_store
+from stats import MarkSketch, SKETCH_STEP, describe_marks, sketch_buckets
 import os
+import base64
+import csv
+import hashlib
+import io
+import json
+import math
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-in-production'
 
+# Database Configuration ('mysql', or 'sqlite' to run locally without a MySQL server)
+app.config['DB_BACKEND'] = os.environ.get('SRAS_DB_BACKEND', 'mysql')
+app.config['SQLITE_PATH'] = os.environ.get('SRAS_SQLITE_PATH', 'student_result.db')
+app.config['DB_POOL_SIZE'] = 5
+app.config['DB_MAX_OVERFLOW'] = 10
+app.config['DB_POOL_TIMEOUT'] = 30
+app.config['DB_POOL_RECYCLE'] = 3600
+app.config['DB_POOL_PRE_PING'] = True
+
 # MySQL Configuration
 app.config['MYSQL_HOST'] = 'localhost'
 app.config['MYSQL_USER'] = 'root'
 app.config['MYSQL_PASSWORD'] = ''
 app.config['MYSQL_DB'] = 'student_result_db'
 app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024 * 1024
+
+# Uploads larger than this are parsed and committed in chunks of STREAM_CHUNK_ROWS rows
+app.config['STREAM_UPLOAD_THRESHOLD'] = 16 * 1024 * 1024
+app.config['STREAM_CHUNK_ROWS'] = 50000
+
+# Bulk ingest: rows per executemany batch, and optional LOAD DATA LOCAL INFILE
+# (requires local_infile enabled on both the server and the client connection)
+app.config['INGEST_BATCH_SIZE'] = 5000
+app.config['INGEST_LOAD_DATA_INFILE'] = False
+if app.config['INGEST_LOAD_DATA_INFILE']:
+    app.config['MYSQL_CUSTOM_OPTIONS'] = {'local_infile': 1}
+
+# Maximum ids per UPDATE ... WHERE id IN (...) statement when re-grading
+app.config['REGRADE_BATCH_SIZE'] = 5000
+
+# Background jobs: uploads and re-grading run on a worker pool and report via /api/jobs/<id>
+app.config['BACKGROUND_JOBS'] = True
+app.config['JOB_WORKERS'] = 2
+app.config['JOB_PROGRESS_INTERVAL'] = 1.0
+app.config['JOB_MAX_ERROR_ROWS'] = 1000
+
+# Seconds a cached dashboard statistic is kept; any write to students invalidates it sooner
+app.config['STATS_CACHE_TTL'] = 300
+
+# Rows per page served by /api/results, and the most a client may ask for
+app.config['RESULTS_PAGE_SIZE'] = 50
+app.config['RESULTS_PAGE_MAX'] = 1000
+
+# Rows fetched per round trip (and per streamed CSV chunk) by /results/export
+app.config['EXPORT_FETCH_ROWS'] = 2000
 
-mysql = MySQL(app)
+# Roll numbers per statement when refreshing student_semester_summary
+app.config['SUMMARY_BATCH_SIZE'] = 1000
+
+# Instrumentation: Prometheus text at /metrics, and warnings for slow statements/requests (seconds)
+app.config['METRICS_ENABLED'] = True
+# Client addresses that may scrape /metrics without an admin session
+app.config['METRICS_ALLOWED_IPS'] = ('127.0.0.1', '::1')
+app.config['SLOW_QUERY_THRESHOLD'] = 0.5
+app.config['SLOW_REQUEST_THRESHOLD'] = 1.0
+
+# Login: password hashing runs in a process pool, waiting calls beyond the queue limit are refused
+app.config['PASSWORD_HASH_METHOD'] = 'scrypt'
+app.config['PASSWORD_HASH_WORKERS'] = os.cpu_count() or 2
+app.config['PASSWORD_HASH_QUEUE'] = 64
+app.config['PASSWORD_HASH_TIMEOUT'] = 10.0
+# (attempts, seconds): failed logins per username and per client IP
+app.config['LOGIN_RATE_LIMIT_USER'] = (5, 300)
+app.config['LOGIN_RATE_LIMIT_IP'] = (30, 60)
+# Reverse proxies in front of the app whose X-Forwarded-For/-Proto headers are trusted for the client address
+app.config['TRUSTED_PROXIES'] = int(os.environ.get('SRAS_TRUSTED_PROXIES', 0))
+
+# Rendered /api/results pages and transcripts, keyed by data version (RESULT_CACHE_URL: redis://... to share)
+app.config['RESULT_CACHE_URL'] = os.environ.get('SRAS_RESULT_CACHE_URL', '')
+app.config['RESULT_CACHE_TTL'] = 600
+app.config['RESULT_CACHE_MAX_ENTRIES'] = 10000
+
+# Parquet snapshots of students (requires pyarrow), rewritten per semester after every write;
+# relative grading reads cohort marks from them instead of the database while they are current
+app.config['SNAPSHOT_DIR'] = os.environ.get('SRAS_SNAPSHOT_DIR', '')
+
+db = Database(app)
+metrics = Metrics(app, db)
+result_cache = create_cache(app.config)
+snapshots = create_snapshot_store(app.config)
+passwords = PasswordHasher(app)
+user_login_limiter = RateLimiter(*app.config['LOGIN_RATE_LIMIT_USER'])
+ip_login_limiter = RateLimiter(*app.config['LOGIN_RATE_LIMIT_IP'])
+if app.config['TRUSTED_PROXIES']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'], x_proto=app.config['TRUSTED_PROXIES'])
 
 # ==========================================
 # GRADING SYSTEMS
@@ -50,76 +145,1776 @@ def calculate_absolute_grade(marks):
     except:
         return 'Invalid', 0
 
-def calculate_relative_grade(marks_list, marks):
+# Percentile cut-offs for relative grading, highest band first
+RELATIVE_GRADE_BANDS = [(90, 'S', 10), (75, 'A', 9), (50, 'B', 8), (25, 'C', 7), (10, 'D', 6), (5, 'E', 5)]
+ABSOLUTE_GRADE_BANDS = [(90, 'S', 10), (80, 'A', 9), (70, 'B', 8), (60, 'C', 7), (50, 'D', 6), (40, 'E', 5)]
+
+def _to_marks_array(marks):
+    """Convert a list/Series of marks to a float array (unparseable values become NaN)"""
+    series = pd.Series(list(marks), dtype=object)
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=float)
+
+def _bands_to_grades(scores, bands):
+    """Map a score array onto grade bands, returning (grades, grade_points) arrays"""
+    conditions = [scores >= cutoff for cutoff, _, _ in bands]
+    grades = np.select(conditions, [g for _, g, _ in bands], default='F').astype(object)
+    points = np.select(conditions, [gp for _, _, gp in bands], default=0)
+    return grades, points
+
+def calculate_absolute_grades(marks):
+    """
+    Vectorized version of calculate_absolute_grade.
+    Returns (grades, grade_points) numpy arrays aligned with the input marks.
+    """
+    marks = _to_marks_array(marks)
+    grades, points = _bands_to_grades(marks, ABSOLUTE_GRADE_BANDS)
+
+    invalid = np.isnan(marks) | ((marks < 0) & (marks != -1)) | (marks > 100)
+    absent = marks == -1
+    grades[invalid] = 'Invalid'
+    points[invalid] = 0
+    grades[absent] = 'AB'
+    points[absent] = 0
+    return grades, points
+
+def calculate_relative_grades(marks, cohort_marks=None):
+    """
+    Batch relative grading for a whole semester-subject cohort in O(n log n).
+    A student's percentile is the share of valid (non-absent) marks strictly below
+    their own, so tied marks share a grade; RELATIVE_GRADE_BANDS maps it to a grade
+    (top 10% S, next 15% A, 25% B, 25% C, 15% D, 5% E, rest F).
+    cohort_marks optionally gives the sorted valid marks of the full cohort when
+    only part of it is being graded (e.g. one chunk of a streamed upload).
+    Returns (grades, grade_points) numpy arrays aligned with the input marks.
+    """
+    marks = _to_marks_array(marks)
+    if cohort_marks is None:
+        valid_marks = np.sort(marks[marks >= 0])
+    else:
+        valid_marks = cohort_marks
+    if valid_marks.size == 0:
+        return calculate_absolute_grades(marks)
+
+    # searchsorted(side='left') gives the number of valid marks strictly below each mark
+    below = np.searchsorted(valid_marks, marks, side='left')
+    percentile = below / valid_marks.size * 100
+    grades, points = _bands_to_grades(percentile, RELATIVE_GRADE_BANDS)
+
+    invalid = np.isnan(marks)
+    absent = marks == -1
+    grades[invalid] = 'Invalid'
+    points[invalid] = 0
+    grades[absent] = 'AB'
+    points[absent] = 0
+    return grades, points
+
+def write_grades_batched(cur, ids, grades, grade_points):
+    """
+    Write new grades with one UPDATE ... WHERE id IN (...) per distinct grade
+    (chunked by REGRADE_BATCH_SIZE ids) instead of one UPDATE per student.
+    """
+    by_grade = defaultdict(list)
+    for record_id, grade, grade_point in zip(ids, grades, grade_points):
+        by_grade[(grade, int(grade_point))].append(int(record_id))
+
+    batch_size = app.config['REGRADE_BATCH_SIZE']
+    updated = 0
+    for (grade, grade_point), grade_ids in by_grade.items():
+        for start in range(0, len(grade_ids), batch_size):
+            chunk = grade_ids[start:start + batch_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cur.execute(f"""
+                UPDATE students 
+                SET grade = %s, grade_point = %s 
+                WHERE id IN ({placeholders})
+            """, [grade, grade_point] + chunk)
+            updated += len(chunk)
+    return updated
+
+def regrade_cohort(cur, semester_id, subject_id, from_snapshot=False):
     """
-    Relative grading using percentile method
-    Top 10% -> S, Next 15% -> A, Next 25% -> B, Next 25% -> C, Next 15% -> D, Next 10% -> E, Rest -> F
+    Re-rank one stored semester-subject cohort; returns the roll numbers whose grades were rewritten.
+    from_snapshot may only be set when the transaction has not written to students yet.
     """
+    records = read_cohort_marks(semester_id, subject_id, from_snapshot)
+    if records.empty:
+        return []
+    
+    grades, grade_points = calculate_relative_grades(records['marks'])
+    write_grades_batched(cur, records['id'], grades, grade_points)
+    return records['roll_number'].tolist()
+
+def apply_relative_grading(semester, subject):
+    """Apply relative grading to all students in a semester-subject combination"""
+    semester_id = dimension_id('semester', semester)
+    if semester_id is not None:
+        check_semesters_open([semester_id])
     try:
-        marks = float(marks)
-        if marks == -1:
-            return 'AB', 0
-        
-        # Filter valid marks (exclude absent)
-        valid_marks = [m for m in marks_list if m >= 0]
-        if not valid_marks:
-            return calculate_absolute_grade(marks)
+        subject_id = dimension_id('subject', subject)
+        if semester_id is None or subject_id is None:
+            return 0
         
-        # Calculate percentile
-        percentile = (sum(m < marks for m in valid_marks) / len(valid_marks)) * 100
+        cur = db.connection.cursor(dictionary=True)
+        roll_numbers = regrade_cohort(cur, semester_id, subject_id, from_snapshot=True)
+        if not roll_numbers:
+            return 0
+        updated = len(roll_numbers)
+        after_students_regraded(semester_id, subject_id, roll_numbers)
         
-        # Assign grade based on percentile
-        if percentile >= 90:
-            return 'S', 10
-        elif percentile >= 75:
-            return 'A', 9
-        elif percentile >= 50:
-            return 'B', 8
-        elif percentile >= 25:
-            return 'C', 7
-        elif percentile >= 10:
-            return 'D', 6
-        elif percentile >= 5:
-            return 'E', 5
-        else:
-            return 'F', 0
-    except:
-        return 'Invalid', 0
+        db.connection.commit()
+        students_changed()
+        cur.close()
+        return updated
+    except Exception:
+        metrics.error('relative_grading')
+        return 0
 
-def apply_relative_grading(semester, subject):
-    """Apply relative grading to all students in a semester-subject combination"""
+def apply_relative_grading_semester(semester):
+    """Apply relative grading to every subject of a semester in one transaction"""
+    semester_id = dimension_id('semester', semester)
+    if semester_id is not None:
+        check_semesters_open([semester_id])
     try:
-        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        if semester_id is None:
+            return 0, 0
         
-        # Get all marks for this semester-subject
-        cur.execute("""
-            SELECT id, marks FROM students 
-            WHERE semester = %s AND subject = %s AND marks >= 0
-        """, (semester, subject))
+        cur = db.connection.cursor(dictionary=True)
         
-        records = cur.fetchall()
-        if not records:
-            return 0
+        records = read_cohort_marks(semester_id, from_snapshot=True)
+        if records.empty:
+            return 0, 0
         
-        marks_list = [r['marks'] for r in records]
+        # Rank each subject cohort separately, then write all grades together
+        records['grade'] = ''
+        records['grade_point'] = 0
+        for _, idx in records.groupby('subject_id', sort=False).groups.items():
+            grades, grade_points = calculate_relative_grades(records.loc[idx, 'marks'])
+            records.loc[idx, 'grade'] = grades
+            records.loc[idx, 'grade_point'] = grade_points
         
-        # Update grades for each student
-        updated = 0
-        for record in records:
-            grade, grade_point = calculate_relative_grade(marks_list, record['marks'])
-            cur.execute("""
-                UPDATE students 
-                SET grade = %s, grade_point = %s 
-                WHERE id = %s
-            """, (grade, grade_point, record['id']))
-            updated += 1
+        updated = write_grades_batched(cur, records['id'], records['grade'], records['grade_point'])
+        after_students_regraded(semester_id)
         
-        mysql.connection.commit()
+        db.connection.commit()
+        students_changed()
         cur.close()
-        return updated
-    except Exception as e:
-        print(f"Error in relative grading: {e}")
-        return 0
+        return updated, records['subject_id'].nunique()
+    except Exception:
+        metrics.error('relative_grading')
+        return 0, 0
+
+# ==========================================
+# DIMENSIONS (SEMESTER / SUBJECT / BRANCH IDS)
+# ==========================================
+
+# students and the derived tables store <kind>_id; names live in these tables
+DIMENSION_TABLES = {'semester': 'semesters', 'subject': 'subjects', 'branch': 'branches'}
+
+_dimensions = {kind: {'ids': {}, 'names': {}} for kind in DIMENSION_TABLES}
+_dimensions_lock = threading.Lock()
+
+def load_dimension(kind):
+    """(Re)load one dimension's name <-> id maps into the in-process cache"""
+    cur = db.connection.cursor()
+    cur.execute(f"SELECT id, name FROM {DIMENSION_TABLES[kind]}")
+    rows = cur.fetchall()
+    cur.close()
+    store_dimension(kind, rows)
+
+def store_dimension(kind, rows):
+    """Replace the cached maps of one dimension with (id, name) rows"""
+    with _dimensions_lock:
+        _dimensions[kind] = {'ids': {name: record_id for record_id, name in rows},
+                             'names': {record_id: name for record_id, name in rows}}
+
+def dimension_id(kind, name):
+    """Id of a semester/subject/branch name, or None if it has never been stored"""
+    if name not in _dimensions[kind]['ids']:
+        # Ids never change, so a miss only means another process added the name since we loaded
+        load_dimension(kind)
+    return _dimensions[kind]['ids'].get(name)
+
+def dimension_name(kind, record_id):
+    """Name behind a semester/subject/branch id"""
+    if record_id not in _dimensions[kind]['names']:
+        load_dimension(kind)
+    return _dimensions[kind]['names'].get(record_id)
+
+def dimension_ids(kind, names):
+    """
+    Map names to ids, creating rows for new names. New rows are committed on a
+    separate connection right away, so call this before the caller's transaction
+    writes anything (an unused name left behind by a rollback is harmless).
+    """
+    names = set(names)
+    if names - _dimensions[kind]['ids'].keys():
+        load_dimension(kind)
+    missing = names - _dimensions[kind]['ids'].keys()
+    if missing:
+        conn = db.connect()
+        try:
+            cur = conn.cursor()
+            cur.executemany(f"INSERT IGNORE INTO {DIMENSION_TABLES[kind]} (name) VALUES (%s)",
+                            [(name,) for name in sorted(missing)])
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+        load_dimension(kind)
+    ids = _dimensions[kind]['ids']
+    return {name: ids[name] for name in names}
+
+def search_dimension(kind, term):
+    """Ids whose names contain term, case-insensitively (the LIKE '%term%' of a dimension)"""
+    load_dimension(kind)
+    term = term.lower()
+    return [record_id for name, record_id in _dimensions[kind]['ids'].items() if term in name.lower()]
+
+def encode_dimensions(rows):
+    """Add semester_id/subject_id/branch_id columns to a rows DataFrame that carries names"""
+    for kind in DIMENSION_TABLES:
+        ids = dimension_ids(kind, rows[kind].unique())
+        rows[f'{kind}_id'] = rows[kind].map(ids)
+    return rows
+
+def decode_dimensions(rows):
+    """Replace the <kind>_id keys of row dicts with the names they stand for"""
+    for row in rows:
+        for kind in DIMENSION_TABLES:
+            key = f'{kind}_id'
+            if key in row:
+                row[kind] = dimension_name(kind, row.pop(key))
+    return rows
+
+# ==========================================
+# TERM ARCHIVE
+# ==========================================
+
+# Results of open semesters live in students (one MySQL partition per semester), those of
+# archived semesters in students_archive. Views without a semester filter read open semesters
+# only; the students_history view (UNION ALL of both) is left for ad-hoc queries
+ARCHIVED_SEMESTERS_SQL = f"SELECT id FROM {DIMENSION_TABLES['semester']} WHERE archived_at IS NOT NULL"
+ARCHIVE_COLUMNS = ['id', 'roll_number', 'name', 'semester_id', 'subject_id', 'marks', 'branch_id', 'grade',
+                   'grade_point', 'row_hash', 'created_at', 'updated_at']
+
+def archived_semester_ids():
+    cur = db.connection.cursor()
+    cur.execute(ARCHIVED_SEMESTERS_SQL)
+    archived = {int(semester_id) for (semester_id,) in cur.fetchall()}
+    cur.close()
+    return archived
+
+def students_source(archived, semester_id):
+    """Table holding the results of semester_id"""
+    return 'students_archive' if semester_id in archived else 'students'
+
+def results_source(filters, resolve=dimension_id):
+    """Table to read a results view from: students unless it is filtered to an archived semester"""
+    semester = filters.get('semester', '')
+    if not semester:
+        return 'students'
+    # An unknown semester matches nothing in the hot table
+    return students_source(archived_semester_ids(), resolve('semester', semester) or 0)
+
+def check_semesters_open(semester_ids):
+    """Refuse writes to archived semesters, whose rows are no longer in students"""
+    semester_ids = {int(semester_id) for semester_id in semester_ids}
+    closed = archived_semester_ids() & semester_ids if semester_ids else set()
+    if closed:
+        names = ', '.join(sorted(dimension_name('semester', semester_id) for semester_id in closed))
+        raise ValueError(f'Results of archived semesters cannot change ({names}); '
+                         f'restore them with flask archive-term --restore first')
+
+def archive_semester(semester_id, restore=False):
+    """
+    Move every result of a semester into students_archive (or back with restore) in
+    one transaction. Returns the number of rows moved.
+    """
+    source, target = ('students_archive', 'students') if restore else ('students', 'students_archive')
+    columns = ', '.join(ARCHIVE_COLUMNS)
+    cur = db.connection.cursor()
+    try:
+        cur.execute(f"INSERT INTO {target} ({columns}) SELECT {columns} FROM {source} WHERE semester_id = %s",
+                    (semester_id,))
+        cur.execute(f"DELETE FROM {source} WHERE semester_id = %s", (semester_id,))
+        moved = cur.rowcount
+        cur.execute(f"UPDATE {DIMENSION_TABLES['semester']} SET archived_at = {'NULL' if restore else 'NOW()'} "
+                    f"WHERE id = %s", (semester_id,))
+        # The rows are unchanged, but anything read while they were moving is stale
+        bump_analytics_version([semester_id])
+        db.connection.commit()
+    except Exception:
+        db.connection.rollback()
+        raise
+    finally:
+        cur.close()
+    students_changed()
+    return moved
+
+@app.cli.command('archive-term')
+@click.argument('semester')
+@click.option('--restore', is_flag=True, help='Move an archived semester back into students')
+def archive_term_command(semester, restore):
+    """Move a closed semester's results into the compressed archive table"""
+    semester_id = dimension_id('semester', semester)
+    if semester_id is None:
+        raise SystemExit(f'Unknown semester: {semester}')
+    if (semester_id in archived_semester_ids()) != restore:
+        raise SystemExit(f'{semester} is {"not " if restore else ""}archived')
+    moved = archive_semester(semester_id, restore)
+    print(f'{"Restored" if restore else "Archived"} {semester}: {moved} results moved')
+
+# ==========================================
+# BULK INGEST
+# ==========================================
+
+RESULT_COLUMNS = ['Roll Number', 'Name', 'Semester', 'Subject', 'Marks', 'Branch']
+INSERT_STUDENT_SQL = """
+    INSERT INTO students (roll_number, name, semester_id, subject_id, marks, grade, grade_point, branch_id, row_hash)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+# Prepared rows carry names (STUDENT_FIELDS); encode_dimensions adds the ids that are stored (STUDENT_COLUMNS)
+STUDENT_FIELDS = ['roll_number', 'name', 'semester', 'subject', 'marks', 'grade', 'grade_point', 'branch']
+STUDENT_COLUMNS = ['roll_number', 'name', 'semester_id', 'subject_id', 'marks', 'grade', 'grade_point', 'branch_id',
+                   'row_hash']
+
+def validate_results_frame(df):
+    """
+    Validate and normalize an uploaded results sheet column-wise.
+    Returns (rows, errors) where rows holds the valid rows under students table column
+    names (without grades) and errors is a list of {'row': <sheet row>, 'error': <reason>} dicts.
+    """
+    # Sheet row numbers (header is row 1) so admins can find the bad lines
+    sheet_rows = pd.Series(df.index + 2, index=df.index)
+
+    text = {}
+    for col in ['Roll Number', 'Name', 'Semester', 'Subject', 'Branch']:
+        text[col] = df[col].where(df[col].notna(), '').astype(str).str.strip()
+    marks = pd.to_numeric(df['Marks'], errors='coerce')
+
+    missing = pd.concat([text[col] == '' for col in text], axis=1).any(axis=1)
+    not_numeric = marks.isna() & ~missing
+    out_of_range = marks.notna() & ((marks < -1) | (marks > 100))
+
+    errors = []
+    for mask, reason in [(missing, 'Missing required field'),
+                         (not_numeric, 'Marks is not a number'),
+                         (out_of_range, 'Marks must be between 0 and 100 (or -1 for absent)')]:
+        for row_no in sheet_rows[mask]:
+            errors.append({'row': int(row_no), 'error': reason})
+    errors.sort(key=lambda e: e['row'])
+
+    valid = ~(missing | not_numeric | out_of_range)
+    rows = pd.DataFrame({
+        'roll_number': text['Roll Number'][valid],
+        'name': text['Name'][valid],
+        'semester': text['Semester'][valid],
+        'subject': text['Subject'][valid],
+        'marks': marks[valid],
+        'branch': text['Branch'][valid],
+    })
+    return rows, errors
+
+def grade_results_frame(rows, grading_type='absolute', cohorts=None):
+    """
+    Add grade and grade_point columns to validated rows.
+    For relative grading, cohorts may map (semester, subject) to the sorted valid marks
+    of the full cohort; otherwise each cohort is taken from rows itself.
+    """
+    if grading_type == 'relative':
+        rows['grade'] = ''
+        rows['grade_point'] = 0
+        # Each semester-subject cohort is ranked in a single vectorized pass
+        for key, idx in rows.groupby(['semester', 'subject'], sort=False).groups.items():
+            cohort_marks = cohorts.get(key) if cohorts is not None else None
+            grades, grade_points = calculate_relative_grades(rows.loc[idx, 'marks'], cohort_marks)
+            rows.loc[idx, 'grade'] = grades
+            rows.loc[idx, 'grade_point'] = grade_points
+    else:
+        grades, grade_points = calculate_absolute_grades(rows['marks'])
+        rows['grade'] = grades
+        rows['grade_point'] = grade_points
+
+    return rows[STUDENT_FIELDS]
+
+def prepare_results_frame(df, grading_type='absolute'):
+    """Validate and grade an in-memory results sheet. Returns (rows, errors)"""
+    rows, errors = validate_results_frame(df)
+    return grade_results_frame(rows, grading_type), errors
+
+def _frame_to_params(rows):
+    """Turn an encoded rows DataFrame into plain Python tuples for the DB driver"""
+    rows = rows[STUDENT_COLUMNS].astype({'marks': float, 'grade_point': int,
+                                         'semester_id': int, 'subject_id': int, 'branch_id': int})
+    return list(rows.itertuples(index=False, name=None))
+
+def bulk_insert_students(cur, rows, grading_type):
+    """
+    Write encoded rows, graded with grading_type, in batches of INGEST_BATCH_SIZE
+    (multi-row executemany or LOAD DATA)
+    """
+    check_semesters_open(rows['semester_id'].unique())
+    if 'row_hash' not in rows:
+        rows = rows.assign(row_hash=row_hashes(rows, grading_type))
+    batch_size = app.config['INGEST_BATCH_SIZE']
+    for start in range(0, len(rows), batch_size):
+        batch = rows.iloc[start:start + batch_size]
+        if app.config['INGEST_LOAD_DATA_INFILE'] and db.dialect == 'mysql':
+            _load_data_infile(cur, batch)
+        else:
+            # MySQLdb rewrites this into multi-row INSERT ... VALUES (...), (...) statements
+            cur.executemany(INSERT_STUDENT_SQL, _frame_to_params(batch))
+
+def _load_data_infile(cur, batch):
+    """Bulk load a batch through LOAD DATA LOCAL INFILE using a temporary CSV file"""
+    fd, tmp_path = tempfile.mkstemp(suffix='.csv')
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+            batch[STUDENT_COLUMNS].to_csv(f, header=False, index=False, lineterminator='\n')
+        cur.execute(f"""
+            LOAD DATA LOCAL INFILE %s INTO TABLE students
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            LINES TERMINATED BY '\\n'
+            ({', '.join(STUDENT_COLUMNS)})
+        """, (tmp_path,))
+    finally:
+        os.remove(tmp_path)
+
+def ingest_results(df, grading_type='absolute', progress=None):
+    """
+    Validate, grade and bulk insert an uploaded results DataFrame.
+    The rows go in as one transaction, so progress, if given, is reported as
+    progress(processed_rows, total_rows) once it commits.
+    Returns a report dict with inserted/error counts, per-row errors and throughput.
+    """
+    started = time.perf_counter()
+    rows, errors = prepare_results_frame(df, grading_type)
+    rows = encode_dimensions(rows)
+
+    cur = db.connection.cursor()
+    try:
+        bulk_insert_students(cur, rows, grading_type)
+        after_students_inserted(rows)
+        db.connection.commit()
+        students_changed()
+    except Exception:
+        db.connection.rollback()
+        raise
+    finally:
+        cur.close()
+
+    if progress:
+        progress(len(df), len(df))
+
+    elapsed = time.perf_counter() - started
+    return {
+        'inserted': len(rows),
+        'error_count': len(errors),
+        'errors': errors,
+        'elapsed': elapsed,
+        'rows_per_sec': len(df) / elapsed if elapsed > 0 else 0,
+    }
+
+def ingest_summary(report):
+    """One-line count summary of an ingest or upsert report"""
+    if 'updated' not in report:
+        return f"{report['inserted']} records added, {report['error_count']} errors."
+    deleted = f", {report['deleted']} deleted" if report['deleted'] else ''
+    return (f"{report['inserted']} added, {report['updated']} updated, {report['unchanged']} unchanged"
+            f"{deleted}, {report['error_count']} errors.")
+
+def flash_ingest_report(report, max_errors=10):
+    """Flash an upload summary plus the first few row-level errors"""
+    flash(f"Upload complete! {ingest_summary(report)} "
+          f"({report['elapsed']:.2f}s, {report['rows_per_sec']:.0f} rows/sec).", 'success')
+    if report['errors']:
+        details = '; '.join(f"row {e['row']}: {e['error']}" for e in report['errors'][:max_errors])
+        if report['error_count'] > max_errors:
+            details += f"; ... and {report['error_count'] - max_errors} more"
+        flash(f'Rejected rows - {details}', 'warning')
+
+# ==========================================
+# STREAMING UPLOADS
+# ==========================================
+
+def read_result_header(filepath):
+    """Read only the header row of an uploaded CSV/Excel sheet"""
+    if filepath.endswith('.csv'):
+        return list(pd.read_csv(filepath, nrows=0).columns)
+    if filepath.endswith('.xlsx'):
+        import openpyxl
+        wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+        try:
+            header = next(wb.active.iter_rows(max_row=1, values_only=True), ())
+        finally:
+            wb.close()
+        return [str(h).strip() for h in header if h is not None]
+    return list(pd.read_excel(filepath, nrows=0).columns)
+
+def read_result_sheet(filepath):
+    """
+    Read a whole uploaded sheet with every column as text, like iter_result_chunks,
+    so roll numbers such as 00123 keep their leading zeros
+    """
+    if filepath.endswith('.csv'):
+        return pd.read_csv(filepath, dtype=object)
+    return pd.read_excel(filepath, dtype=object)
+
+def iter_result_chunks(filepath, chunk_rows):
+    """
+    Yield the rows of an uploaded sheet as DataFrames of at most chunk_rows rows.
+    CSV is parsed with pandas chunksize and .xlsx through openpyxl's read-only row
+    iterator, so memory stays bounded; legacy .xls has no streaming reader and is read whole.
+    """
+    if filepath.endswith('.csv'):
+        # dtype=object keeps each chunk's parsing independent of what other chunks contain
+        yield from pd.read_csv(filepath, chunksize=chunk_rows, dtype=object)
+    elif filepath.endswith('.xlsx'):
+        import openpyxl
+        wb = openpyxl.load_workbook(filepath, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else '' for h in next(rows, ())]
+            buffer = []
+            start = 0
+            for row in rows:
+                buffer.append(row)
+                if len(buffer) >= chunk_rows:
+                    yield pd.DataFrame(buffer, columns=header, index=range(start, start + len(buffer)))
+                    start += len(buffer)
+                    buffer = []
+            if buffer:
+                yield pd.DataFrame(buffer, columns=header, index=range(start, start + len(buffer)))
+        finally:
+            wb.close()
+    else:
+        yield read_result_sheet(filepath)
+
+def collect_cohort_marks(filepath, chunk_rows):
+    """
+    First pass of a streamed relative-grading upload: gather the valid marks of every
+    (semester, subject) cohort. Only the marks are kept, so memory is one float per row.
+    Returns (cohorts, errors, row_count) with each cohort's marks sorted for
+    searchsorted ranking.
+    """
+    parts = defaultdict(list)
+    errors = []
+    row_count = 0
+    for chunk in iter_result_chunks(filepath, chunk_rows):
+        rows, chunk_errors = validate_results_frame(chunk)
+        errors.extend(chunk_errors)
+        row_count += len(chunk)
+        for key, marks in rows.groupby(['semester', 'subject'], sort=False)['marks']:
+            parts[key].append(marks.to_numpy(dtype=float))
+
+    cohorts = {}
+    for key, arrays in parts.items():
+        marks = np.concatenate(arrays)
+        cohorts[key] = np.sort(marks[marks >= 0])
+    return cohorts, errors, row_count
+
+def ingest_results_streaming(filepath, grading_type='absolute', progress=None):
+    """
+    Validate, grade and insert an uploaded sheet chunk by chunk, committing after each
+    chunk. Relative grading makes two passes over the file: the first collects each
+    cohort's marks, the second grades every chunk against its complete cohort.
+    progress, if given, is called as progress(processed_rows, total_rows) after each
+    chunk; total_rows is None when it is not known in advance.
+    Returns the same report dict as ingest_results.
+    """
+    started = time.perf_counter()
+    chunk_rows = app.config['STREAM_CHUNK_ROWS']
+
+    cohorts = None
+    errors = []
+    expected_rows = None
+    if grading_type == 'relative':
+        cohorts, errors, expected_rows = collect_cohort_marks(filepath, chunk_rows)
+
+    inserted = 0
+    total_rows = 0
+    cur = db.connection.cursor()
+    try:
+        for chunk in iter_result_chunks(filepath, chunk_rows):
+            rows, chunk_errors = validate_results_frame(chunk)
+            if cohorts is None:
+                errors.extend(chunk_errors)
+            rows = encode_dimensions(grade_results_frame(rows, grading_type, cohorts))
+
+            bulk_insert_students(cur, rows, grading_type)
+            after_students_inserted(rows)
+            db.connection.commit()
+            students_changed()
+            inserted += len(rows)
+            total_rows += len(chunk)
+            if progress:
+                progress(total_rows, expected_rows)
+    except Exception:
+        db.connection.rollback()
+        raise
+    finally:
+        cur.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'inserted': inserted,
+        'error_count': len(errors),
+        'errors': errors,
+        'elapsed': elapsed,
+        'rows_per_sec': total_rows / elapsed if elapsed > 0 else 0,
+    }
+
+# ==========================================
+# UPSERT INGEST
+# ==========================================
+
+RESULT_KEY = ['roll_number', 'semester_id', 'subject_id']
+# Sheet values covered by row_hash; grades are derived from them and the grading type
+HASH_FIELDS = ['name', 'marks', 'branch']
+
+def row_hashes(rows, grading_type):
+    """
+    Hex 64-bit hash of each row's sheet values and grading type, stored as
+    students.row_hash for change detection
+    """
+    values = rows[HASH_FIELDS].astype({'name': str, 'marks': float, 'branch': str}).assign(grading_type=grading_type)
+    return pd.util.hash_pandas_object(values, index=False).map('{:016x}'.format)
+
+def drop_duplicate_keys(rows):
+    """
+    Keep the last sheet row for each (roll_number, semester, subject).
+    Returns (rows, errors) with an error for every row that was dropped.
+    """
+    duplicate = rows.duplicated(['roll_number', 'semester', 'subject'], keep='last')
+    errors = [{'row': int(index) + 2, 'error': 'Duplicate roll number, semester and subject (a later row wins)'}
+              for index in rows.index[duplicate]]
+    return rows[~duplicate], errors
+
+def find_stored_rows(cur, rows):
+    """(id, row_hash) of the stored rows sharing a key with rows, keyed by RESULT_KEY tuples"""
+    stored = {}
+    batch_size = app.config['INGEST_BATCH_SIZE']
+    for (semester_id, subject_id), group in rows.groupby(['semester_id', 'subject_id']):
+        roll_numbers = group['roll_number'].unique().tolist()
+        for start in range(0, len(roll_numbers), batch_size):
+            chunk = roll_numbers[start:start + batch_size]
+            cur.execute(f"""
+                SELECT id, roll_number, row_hash FROM students 
+                WHERE semester_id = %s AND subject_id = %s AND roll_number IN ({', '.join(['%s'] * len(chunk))})
+            """, [int(semester_id), int(subject_id)] + chunk)
+            for record_id, roll_number, row_hash in cur.fetchall():
+                stored[(roll_number, int(semester_id), int(subject_id))] = (record_id, row_hash)
+    return stored
+
+def update_students(cur, rows):
+    """Overwrite the stored rows in rows['id'] with new sheet values and grades"""
+    check_semesters_open(rows['semester_id'].unique())
+    params = [(name, float(marks), int(branch_id), grade, int(grade_point), row_hash, int(record_id))
+              for name, marks, branch_id, grade, grade_point, row_hash, record_id
+              in rows[['name', 'marks', 'branch_id', 'grade', 'grade_point', 'row_hash', 'id']].itertuples(
+                  index=False, name=None)]
+    batch_size = app.config['INGEST_BATCH_SIZE']
+    for start in range(0, len(params), batch_size):
+        cur.executemany("""
+            UPDATE students 
+            SET name = %s, marks = %s, branch_id = %s, grade = %s, grade_point = %s, row_hash = %s
+            WHERE id = %s
+        """, params[start:start + batch_size])
+
+def upsert_chunk(cur, rows, grading_type):
+    """
+    Diff encoded rows against the stored rows by key and row_hash, then insert the
+    new ones and update the changed ones. Returns (inserted, updated) DataFrames.
+    """
+    rows = rows.assign(row_hash=row_hashes(rows, grading_type))
+    stored = find_stored_rows(cur, rows)
+    matches = [stored.get(key) for key in
+               zip(rows['roll_number'], rows['semester_id'].astype(int), rows['subject_id'].astype(int))]
+
+    is_new = np.array([match is None for match in matches], dtype=bool)
+    changed = np.array([match is not None and match[1] != row_hash
+                        for match, row_hash in zip(matches, rows['row_hash'])], dtype=bool)
+    inserted = rows[is_new]
+    updated = rows[changed].assign(id=[match[0] for match, flag in zip(matches, changed) if flag])
+
+    bulk_insert_students(cur, inserted, grading_type)
+    update_students(cur, updated)
+    return inserted, updated
+
+def delete_missing_rows(cur, seen):
+    """
+    Delete stored rows of the sheet's semester-subject cohorts whose roll number the
+    sheet no longer lists. seen maps (semester_id, subject_id) to the sheet's roll numbers.
+    Returns the deleted rows as (roll_number, semester_id, subject_id) tuples.
+    """
+    deleted = []
+    for (semester_id, subject_id), roll_numbers in seen.items():
+        cur.execute("""
+            SELECT id, roll_number FROM students 
+            WHERE semester_id = %s AND subject_id = %s
+        """, (semester_id, subject_id))
+        missing = [(record_id, roll_number) for record_id, roll_number in cur.fetchall()
+                   if roll_number not in roll_numbers]
+        batch_size = app.config['REGRADE_BATCH_SIZE']
+        for start in range(0, len(missing), batch_size):
+            chunk = [record_id for record_id, _ in missing[start:start + batch_size]]
+            cur.execute(f"DELETE FROM students WHERE id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+        deleted += [(roll_number, semester_id, subject_id) for _, roll_number in missing]
+    return deleted
+
+def after_students_upserted(changed_keys, grading_type):
+    """
+    Bring grades and derived tables up to date for the cohorts an upsert touched.
+    changed_keys holds the (roll_number, semester_id, subject_id) of every inserted,
+    updated or deleted row. Relative cohorts are re-ranked from the stored marks.
+    """
+    cohorts = defaultdict(set)
+    for roll_number, semester_id, subject_id in changed_keys:
+        cohorts[(semester_id, subject_id)].add(roll_number)
+
+    cur = db.connection.cursor(dictionary=True)
+    roll_numbers = defaultdict(set)
+    for (semester_id, subject_id), cohort_rolls in cohorts.items():
+        roll_numbers[semester_id] |= cohort_rolls
+        if grading_type == 'relative':
+            roll_numbers[semester_id].update(regrade_cohort(cur, semester_id, subject_id))
+        rollup_rebuild(semester_id, subject_id)
+    cur.close()
+
+    for semester_id, rolls in roll_numbers.items():
+        refresh_student_summaries(semester_id, sorted(rolls))
+    if cohorts:
+        bump_analytics_version(roll_numbers.keys())
+
+def upsert_results(chunks, grading_type='absolute', delete_missing=False, progress=None, expected_rows=None):
+    """
+    Idempotent ingest keyed on (roll_number, semester, subject): only new rows are
+    inserted and only rows whose sheet values changed are updated, so re-uploading a
+    corrected sheet costs in proportion to the corrections. With delete_missing, rows
+    of the sheet's semester-subject cohorts that the sheet no longer lists are deleted.
+    Each chunk commits on its own; grades of relative cohorts, summaries and rollups
+    are brought up to date in a final transaction.
+    Returns a report dict with inserted/updated/unchanged/deleted/error counts.
+    """
+    started = time.perf_counter()
+    report = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0, 'errors': []}
+    seen = defaultdict(set)
+    changed_keys = set()
+    total_rows = 0
+
+    cur = db.connection.cursor()
+    try:
+        for chunk in chunks:
+            rows, errors = validate_results_frame(chunk)
+            rows, duplicate_errors = drop_duplicate_keys(rows)
+            report['errors'] += sorted(errors + duplicate_errors, key=lambda e: e['row'])
+            # Relative grades written here are provisional until the final re-rank
+            rows = encode_dimensions(grade_results_frame(rows, grading_type))
+
+            inserted, updated = upsert_chunk(cur, rows, grading_type)
+            if len(inserted) or len(updated):
+                bump_analytics_version(pd.concat([inserted, updated])['semester_id'].unique())
+            db.connection.commit()
+
+            for frame in (inserted, updated):
+                changed_keys.update(zip(frame['roll_number'], frame['semester_id'].astype(int),
+                                        frame['subject_id'].astype(int)))
+            for key, group in rows.groupby(['semester_id', 'subject_id'])['roll_number']:
+                seen[(int(key[0]), int(key[1]))].update(group)
+            report['inserted'] += len(inserted)
+            report['updated'] += len(updated)
+            report['unchanged'] += len(rows) - len(inserted) - len(updated)
+            total_rows += len(chunk)
+            if progress:
+                progress(total_rows, expected_rows)
+
+        if delete_missing:
+            deleted = delete_missing_rows(cur, seen)
+            report['deleted'] = len(deleted)
+            changed_keys.update(deleted)
+        after_students_upserted(changed_keys, grading_type)
+        db.connection.commit()
+        students_changed()
+    except Exception:
+        db.connection.rollback()
+        raise
+    finally:
+        cur.close()
+
+    elapsed = time.perf_counter() - started
+    report.update({
+        'processed': total_rows,
+        'error_count': len(report['errors']),
+        'elapsed': elapsed,
+        'rows_per_sec': total_rows / elapsed if elapsed > 0 else 0,
+    })
+    return report
+
+# ==========================================
+# STUDENT SUMMARIES (SGPA / CLASS RANK)
+# ==========================================
+
+def refresh_student_summaries(semester_id, roll_numbers=None):
+    """
+    Recompute student_semester_summary rows for one semester id, limited to roll_numbers
+    when given (None refreshes the whole semester), then re-rank the branches those
+    students belong to. Uses the request's connection without committing, so it
+    commits together with the write that made it necessary. Every subject carries one credit, so SGPA is the mean
+    grade point over the semester's subjects.
+    """
+    if roll_numbers is not None:
+        roll_numbers = list(dict.fromkeys(roll_numbers))
+        if not roll_numbers:
+            return
+        batches = [roll_numbers[i:i + app.config['SUMMARY_BATCH_SIZE']]
+                   for i in range(0, len(roll_numbers), app.config['SUMMARY_BATCH_SIZE'])]
+    else:
+        batches = [None]
+
+    cur = db.connection.cursor(dictionary=True)
+    branches = set()
+    for batch in batches:
+        roll_filter, roll_params = '', []
+        if batch is not None:
+            roll_filter = f" AND roll_number IN ({', '.join(['%s'] * len(batch))})"
+            roll_params = list(batch)
+
+        # Branches these students were ranked in before, in case a re-upload moved them
+        cur.execute(f"""
+            SELECT DISTINCT branch_id FROM student_semester_summary 
+            WHERE semester_id = %s {roll_filter}
+        """, [semester_id] + roll_params)
+        branches.update(r['branch_id'] for r in cur.fetchall())
+
+        cur.execute(f"""
+            INSERT INTO student_semester_summary
+                (roll_number, semester_id, branch_id, name, subjects, credits, grade_points, sgpa)
+            SELECT roll_number, semester_id, MAX(branch_id), MAX(name), COUNT(*), COUNT(*),
+                   SUM(grade_point), SUM(grade_point) / COUNT(*)
+            FROM students 
+            WHERE semester_id = %s {roll_filter}
+            GROUP BY roll_number, semester_id
+            ON DUPLICATE KEY UPDATE branch_id = VALUES(branch_id), name = VALUES(name),
+                subjects = VALUES(subjects), credits = VALUES(credits),
+                grade_points = VALUES(grade_points), sgpa = VALUES(sgpa)
+        """, [semester_id] + roll_params)
+
+        # Students whose last results in the semester were deleted lose their summary
+        cur.execute(f"""
+            DELETE FROM student_semester_summary 
+            WHERE semester_id = %s {roll_filter}
+              AND NOT EXISTS (
+                  SELECT 1 FROM students s 
+                  WHERE s.roll_number = student_semester_summary.roll_number
+                    AND s.semester_id = student_semester_summary.semester_id
+              )
+        """, [semester_id] + roll_params)
+
+        cur.execute(f"""
+            SELECT DISTINCT branch_id FROM student_semester_summary 
+            WHERE semester_id = %s {roll_filter}
+        """, [semester_id] + roll_params)
+        branches.update(r['branch_id'] for r in cur.fetchall())
+
+    for branch_id in branches:
+        rank_branch(cur, semester_id, branch_id)
+    cur.close()
+
+def rank_branch(cur, semester_id, branch_id):
+    """Re-rank one branch-semester class by SGPA (ties share a rank)"""
+    if db.dialect == 'sqlite':
+        # SQLite has UPDATE ... FROM instead of UPDATE ... JOIN
+        cur.execute("""
+            UPDATE student_semester_summary
+            SET class_rank = ranked.class_rank, class_size = ranked.class_size
+            FROM (
+                SELECT roll_number,
+                       RANK() OVER (ORDER BY sgpa DESC) AS class_rank,
+                       COUNT(*) OVER () AS class_size
+                FROM student_semester_summary 
+                WHERE semester_id = %s AND branch_id = %s
+            ) ranked
+            WHERE student_semester_summary.roll_number = ranked.roll_number
+              AND student_semester_summary.semester_id = %s AND student_semester_summary.branch_id = %s
+        """, (semester_id, branch_id, semester_id, branch_id))
+        return
+    cur.execute("""
+        UPDATE student_semester_summary s
+        JOIN (
+            SELECT roll_number,
+                   RANK() OVER (ORDER BY sgpa DESC) AS class_rank,
+                   COUNT(*) OVER () AS class_size
+            FROM student_semester_summary 
+            WHERE semester_id = %s AND branch_id = %s
+        ) ranked ON s.roll_number = ranked.roll_number
+        SET s.class_rank = ranked.class_rank, s.class_size = ranked.class_size
+        WHERE s.semester_id = %s AND s.branch_id = %s
+    """, (semester_id, branch_id, semester_id, branch_id))
+
+def refresh_summaries_for_rows(rows):
+    """Refresh summaries for the (semester_id, roll_number) pairs in an encoded rows DataFrame"""
+    for semester_id, roll_numbers in rows.groupby('semester_id')['roll_number'].unique().items():
+        refresh_student_summaries(int(semester_id), roll_numbers.tolist())
+
+# ==========================================
+# ANALYTICS ROLLUPS
+# ==========================================
+
+def rollup_add_rows(rows):
+    """Fold newly inserted rows into analytics_rollup and mark_sketch as per-group deltas"""
+    if rows.empty:
+        return
+    valid_marks = rows['marks'] >= 0
+    deltas = rows.assign(
+        marks_sum=rows['marks'].where(valid_marks, 0),
+        marks_count=valid_marks.astype(int),
+    ).groupby(['semester_id', 'branch_id', 'subject_id', 'grade']).agg(
+        row_count=('marks', 'size'),
+        marks_sum=('marks_sum', 'sum'),
+        marks_count=('marks_count', 'sum'),
+    ).reset_index()
+
+    cur = db.connection.cursor()
+    cur.executemany("""
+        INSERT INTO analytics_rollup (semester_id, branch_id, subject_id, grade, row_count, marks_sum, marks_count)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE row_count = row_count + VALUES(row_count),
+            marks_sum = marks_sum + VALUES(marks_sum),
+            marks_count = marks_count + VALUES(marks_count)
+    """, [(int(sem), int(branch), int(subj), grade, int(n), float(total), int(count))
+          for sem, branch, subj, grade, n, total, count in deltas.itertuples(index=False, name=None)])
+
+    valid = rows[valid_marks]
+    if not valid.empty:
+        bucket_counts = valid.assign(bucket=sketch_buckets(valid['marks'])).groupby(
+            ['semester_id', 'branch_id', 'subject_id', 'bucket']).size()
+        cur.executemany("""
+            INSERT INTO mark_sketch (semester_id, branch_id, subject_id, bucket, row_count)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE row_count = row_count + VALUES(row_count)
+        """, [(int(sem), int(branch), int(subj), int(bucket), int(n))
+              for (sem, branch, subj, bucket), n in bucket_counts.items()])
+    cur.close()
+
+def rollup_rebuild(semester_id, subject_id=None):
+    """Recompute the rollup groups and mark sketches of a semester (or one semester-subject) after grades or marks changed"""
+    params = [semester_id] + ([subject_id] if subject_id else [])
+    subject_filter = " AND subject_id = %s" if subject_id else ""
+    cur = db.connection.cursor()
+    cur.execute(f"DELETE FROM analytics_rollup WHERE semester_id = %s {subject_filter}", params)
+    cur.execute(f"""
+        INSERT INTO analytics_rollup (semester_id, branch_id, subject_id, grade, row_count, marks_sum, marks_count)
+        SELECT semester_id, branch_id, subject_id, grade, COUNT(*),
+               SUM(CASE WHEN marks >= 0 THEN marks ELSE 0 END), SUM(marks >= 0)
+        FROM students 
+        WHERE semester_id = %s {subject_filter}
+        GROUP BY semester_id, branch_id, subject_id, grade
+    """, params)
+    cur.execute(f"DELETE FROM mark_sketch WHERE semester_id = %s {subject_filter}", params)
+    cur.execute(f"""
+        INSERT INTO mark_sketch (semester_id, branch_id, subject_id, bucket, row_count)
+        SELECT semester_id, branch_id, subject_id, FLOOR(marks / {SKETCH_STEP}), COUNT(*)
+        FROM students 
+        WHERE semester_id = %s {subject_filter} AND marks >= 0
+        GROUP BY semester_id, branch_id, subject_id, FLOOR(marks / {SKETCH_STEP})
+    """, params)
+    cur.close()
+
+ANALYTICS_STATE_SQL = "SELECT version, updated_at FROM app_state WHERE name = 'analytics'"
+
+def bump_analytics_version(semester_ids):
+    """
+    Advance the version behind /api/analytics ETags, in the current transaction, and
+    stamp the written semesters with it (see current_snapshot)
+    """
+    cur = db.connection.cursor()
+    cur.execute("""
+        INSERT INTO app_state (name, version) VALUES ('analytics', 1)
+        ON DUPLICATE KEY UPDATE version = version + 1, updated_at = NOW()
+    """)
+    cur.execute(ANALYTICS_STATE_SQL)
+    version = cur.fetchone()[0]
+    cur.executemany("""
+        INSERT INTO app_state (name, version) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE version = VALUES(version), updated_at = NOW()
+    """, [(f'semester:{int(semester_id)}', version) for semester_id in semester_ids])
+    cur.close()
+
+def after_students_inserted(rows):
+    """Keep derived tables current for newly inserted (encoded) rows, before the caller commits"""
+    refresh_summaries_for_rows(rows)
+    rollup_add_rows(rows)
+    bump_analytics_version(rows['semester_id'].unique())
+
+def after_students_regraded(semester_id, subject_id=None, roll_numbers=None):
+    """Keep derived tables current after re-grading a semester-subject, or a whole semester"""
+    refresh_student_summaries(semester_id, roll_numbers)
+    rollup_rebuild(semester_id, subject_id)
+    bump_analytics_version([semester_id])
+
+# ==========================================
+# PARQUET SNAPSHOTS
+# ==========================================
+
+# Cohort columns read for relative grading
+COHORT_COLUMNS = ['id', 'roll_number', 'subject_id', 'marks']
+
+_snapshot_executor = None
+_snapshot_lock = threading.Lock()
+_snapshot_refresh_queued = [False]
+
+def semester_stamps():
+    """Data version of the last write to each semester (0 if never stamped), from app_state"""
+    cur = db.connection.cursor()
+    cur.execute(f"SELECT id FROM {DIMENSION_TABLES['semester']}")
+    stamps = {int(semester_id): 0 for (semester_id,) in cur.fetchall()}
+    cur.execute("SELECT name, version FROM app_state WHERE name LIKE %s", ('semester:%',))
+    stamps.update({int(name.split(':', 1)[1]): int(version) for name, version in cur.fetchall()})
+    cur.close()
+    return stamps
+
+def current_snapshot(semester_ids=None):
+    """
+    The snapshot store if it is current for the given semesters (by default every
+    semester), else None. A stale snapshot queues a refresh, so writes made by other
+    worker processes are picked up too.
+    """
+    if snapshots is None:
+        return None
+    stamps = semester_stamps()
+    built = snapshots.versions()
+    if all(built.get(semester_id) == stamps.get(semester_id, 0)
+           for semester_id in (stamps if semester_ids is None else semester_ids)):
+        return snapshots
+    schedule_snapshot_refresh()
+    return None
+
+def refresh_snapshots():
+    """
+    Rewrite the snapshot of every semester written since it was built; returns their ids.
+    Only rows in students are copied, so an archived semester's snapshot is emptied.
+    """
+    built = snapshots.versions()
+    stale = [semester_id for semester_id, version in semester_stamps().items() if built.get(semester_id) != version]
+    db.connection.commit()
+
+    cur = db.connection.cursor()
+    try:
+        for semester_id in stale:
+            # Read the stamp before the rows: at worst the rows are newer than the recorded
+            # version, which only makes the semester look stale again
+            cur.execute("SELECT version FROM app_state WHERE name = %s", (f'semester:{semester_id}',))
+            stamp = cur.fetchone()
+            cur.execute(f"""
+                SELECT {', '.join(SNAPSHOT_COLUMNS)}, branch_id FROM students 
+                WHERE semester_id = %s
+            """, (semester_id,))
+            rows = pd.DataFrame(list(cur.fetchall()), columns=SNAPSHOT_COLUMNS + ['branch_id'])
+            db.connection.commit()
+            snapshots.write_semester(semester_id, rows, int(stamp[0]) if stamp else 0)
+    finally:
+        cur.close()
+    return stale
+
+def _run_snapshot_refresh():
+    with app.app_context():
+        # Writes committed from here on queue another refresh
+        with _snapshot_lock:
+            _snapshot_refresh_queued[0] = False
+        try:
+            refresh_snapshots()
+        except Exception:
+            metrics.error('snapshot_refresh')
+
+def schedule_snapshot_refresh():
+    """Queue one snapshot refresh on a background thread (inline without BACKGROUND_JOBS)"""
+    global _snapshot_executor
+    if snapshots is None:
+        return
+    with _snapshot_lock:
+        if _snapshot_refresh_queued[0]:
+            return
+        _snapshot_refresh_queued[0] = True
+        if app.config['BACKGROUND_JOBS'] and _snapshot_executor is None:
+            _snapshot_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sras-snapshot')
+    if app.config['BACKGROUND_JOBS']:
+        _snapshot_executor.submit(_run_snapshot_refresh)
+    else:
+        _run_snapshot_refresh()
+
+def read_cohort_marks(semester_id, subject_id=None, from_snapshot=False):
+    """
+    COHORT_COLUMNS of the valid marks of a semester, or of one semester-subject. With
+    from_snapshot they come from the Parquet snapshot when it is current for the semester.
+    """
+    filters = {'semester_id': semester_id}
+    if subject_id is not None:
+        filters['subject_id'] = subject_id
+    store = current_snapshot([semester_id]) if from_snapshot else None
+    if store is not None:
+        rows = store.read(COHORT_COLUMNS, filters)
+        return rows[rows['marks'] >= 0].reset_index(drop=True)
+
+    cur = db.connection.cursor()
+    cur.execute(f"""
+        SELECT {', '.join(COHORT_COLUMNS)} FROM students 
+        WHERE {' AND '.join(f'{column} = %s' for column in filters)} AND marks >= 0
+    """, list(filters.values()))
+    rows = pd.DataFrame(list(cur.fetchall()), columns=COHORT_COLUMNS).astype({'marks': float})
+    cur.close()
+    return rows
+
+@app.cli.command('refresh-snapshots')
+def refresh_snapshots_command():
+    """Build or bring up to date the Parquet snapshots under SNAPSHOT_DIR"""
+    if snapshots is None:
+        raise SystemExit('SNAPSHOT_DIR is not set')
+    stale = refresh_snapshots()
+    print(f'Rewrote {len(stale)} semester snapshots in {snapshots.root}')
+
+# ==========================================
+# RELATIVE GRADING INDEX
+# ==========================================
+
+def relative_band(percentile):
+    """(grade, grade_point) of a single percentile, as _bands_to_grades assigns it"""
+    for cutoff, grade, grade_point in RELATIVE_GRADE_BANDS:
+        if percentile >= cutoff:
+            return grade, grade_point
+    return 'F', 0
+
+class CohortIndex:
+    """
+    Sorted valid marks of one semester-subject cohort, so a single new mark is
+    graded with a binary search instead of re-reading the cohort.
+    """
+
+    def __init__(self, marks):
+        self.marks = sorted(marks)
+
+    def plan_insert(self, mark):
+        """
+        Grade a new valid mark against the cohort without inserting it.
+        Returns ((grade, grade_point), changed) where changed maps each stored mark
+        whose relative grade the new mark alters to its new (grade, grade_point).
+        A stored mark m with b marks below it moves from b/n to (b + [mark < m])/(n + 1),
+        a step smaller than 1/(n + 1), so it can only cross a cut-off c when b lies
+        within one place of c * n / 100: a handful of positions per band are checked.
+        """
+        n = len(self.marks)
+        changed = {}
+        candidates = set()
+        for cutoff, _, _ in RELATIVE_GRADE_BANDS:
+            centre = int(cutoff * n / 100)
+            candidates.update(self.marks[max(centre - 2, 0):centre + 3])
+        for stored in candidates:
+            below = bisect_left(self.marks, stored)
+            new = relative_band((below + (mark < stored)) / (n + 1) * 100)
+            if new != relative_band(below / n * 100):
+                changed[stored] = new
+        return relative_band(bisect_left(self.marks, mark) / (n + 1) * 100), changed
+
+    def insert(self, mark):
+        insort(self.marks, mark)
+
+_cohort_indexes = {}
+_cohort_index_lock = threading.Lock()
+# Data version the cached indexes were built at; any other write to students discards them
+_cohort_index_version = [None]
+
+def get_cohort_index(semester_id, subject_id, version):
+    """The CohortIndex of a semester-subject, loaded on first use at this data version"""
+    if _cohort_index_version[0] != version:
+        _cohort_indexes.clear()
+        _cohort_index_version[0] = version
+    key = (semester_id, subject_id)
+    if key not in _cohort_indexes:
+        _cohort_indexes[key] = CohortIndex(read_cohort_marks(semester_id, subject_id, from_snapshot=True)['marks'].tolist())
+    return _cohort_indexes[key]
+
+def insert_relative_student(rows):
+    """
+    Insert a one-row encoded frame graded relatively against its stored cohort, and
+    re-grade just the stored students the new mark pushes across a percentile cut-off.
+    Assumes the stored cohort is relatively graded. Returns how many stored rows were re-graded.
+    """
+    row = rows.iloc[0]
+    semester_id, subject_id = int(row['semester_id']), int(row['subject_id'])
+    mark = float(row['marks'])
+
+    with _cohort_index_lock:
+        version = data_version()
+        cur = db.connection.cursor()
+        try:
+            index = get_cohort_index(semester_id, subject_id, version)
+            changed = {}
+            if mark >= 0:
+                (grade, grade_point), changed = index.plan_insert(mark)
+            else:
+                grade, grade_point = calculate_absolute_grade(mark)
+            rows = rows.assign(grade=grade, grade_point=grade_point)
+            bulk_insert_students(cur, rows, 'relative')
+
+            regraded = []
+            if changed:
+                marks = list(changed)
+                # The new row (the only one of its roll number in the cohort) already has its grade
+                cur.execute(f"""
+                    SELECT id, roll_number, marks FROM students 
+                    WHERE semester_id = %s AND subject_id = %s AND roll_number != %s
+                      AND marks IN ({', '.join(['%s'] * len(marks))})
+                """, [semester_id, subject_id, row['roll_number']] + marks)
+                regraded = cur.fetchall()
+                new_grades = [changed[float(stored)] for _, _, stored in regraded]
+                write_grades_batched(cur, [record_id for record_id, _, _ in regraded],
+                                     [g for g, _ in new_grades], [gp for _, gp in new_grades])
+                after_students_regraded(semester_id, subject_id,
+                                        [roll_number for _, roll_number, _ in regraded] + [row['roll_number']])
+            else:
+                after_students_inserted(rows)
+
+            # The index stays valid only if this insert was the one write since it was read
+            new_version = data_version()
+            db.connection.commit()
+        except Exception:
+            db.connection.rollback()
+            raise
+        finally:
+            cur.close()
+
+        if new_version == version + 1:
+            if mark >= 0:
+                index.insert(mark)
+            _cohort_index_version[0] = new_version
+        else:
+            _cohort_indexes.clear()
+    students_changed()
+    return len(regraded)
+
+# ==========================================
+# STATISTICS CACHE
+# ==========================================
+
+_stats_cache = {}
+_stats_cache_lock = threading.Lock()
+
+def stats_version():
+    """data_version(), read once per request (students_changed forgets it)"""
+    if 'stats_version' not in g:
+        g.stats_version = data_version()
+    return g.stats_version
+
+def cached_stat(key, loader):
+    """
+    Return the value cached for key at the current data version, calling loader() on
+    a miss. Writes in any worker process advance the version, so no worker serves a
+    stale value; entries also expire after STATS_CACHE_TTL seconds.
+    """
+    version = stats_version()
+    now = time.monotonic()
+    with _stats_cache_lock:
+        entry = _stats_cache.get(key)
+    if entry and entry[0] == version and now - entry[1] < app.config['STATS_CACHE_TTL']:
+        return entry[2]
+
+    value = loader()
+    with _stats_cache_lock:
+        _stats_cache[key] = (version, now, value)
+    return value
+
+def invalidate_stats_cache():
+    """Drop every cached statistic"""
+    with _stats_cache_lock:
+        _stats_cache.clear()
+    if has_app_context():
+        g.pop('stats_version', None)
+
+def students_changed():
+    """Called after every committed write to the students table"""
+    invalidate_stats_cache()
+    schedule_snapshot_refresh()
+
+def get_filter_options():
+    """Distinct semesters, subjects and branches for the filter dropdowns, from the analytics rollup"""
+    def load():
+        cur = db.connection.cursor(dictionary=True)
+        # analytics_rollup has a row per stored (semester, branch, subject, grade), archived or not
+        cur.execute("SELECT DISTINCT semester_id, subject_id, branch_id FROM analytics_rollup")
+        combos = decode_dimensions(cur.fetchall())
+        cur.close()
+        return {
+            'semesters': sorted({r['semester'] for r in combos}),
+            'subjects': sorted({r['subject'] for r in combos}),
+            'branches': sorted({r['branch'] for r in combos}),
+        }
+    return cached_stat(('filter_options',), load)
+
+def build_results_filter(filters, fields=('semester', 'subject', 'branch'), resolve=dimension_id):
+    """
+    WHERE clause and params for the semester/subject/branch filters shared by the
+    results views. Filters are given by name and matched on the dimension ids
+    that resolve(kind, name) returns.
+    """
+    filter_query = "WHERE 1=1"
+    params = []
+    for field in fields:
+        value = filters.get(field, '')
+        if value:
+            filter_query += f" AND {field}_id = %s"
+            # Ids start at 1, so an unknown name matches nothing
+            params.append(resolve(field, value) or 0)
+    return filter_query, params
+
+def get_dashboard_totals(semester_filter='', branch_filter=''):
+    """Distinct student, subject and semester counts for a dashboard filter in one aggregate query"""
+    def load():
+        filters = {'semester': semester_filter, 'branch': branch_filter}
+        filter_query, params = build_results_filter(filters)
+        
+        cur = db.connection.cursor(dictionary=True)
+        cur.execute(f"""
+            SELECT COUNT(DISTINCT roll_number) as total_students,
+                   COUNT(DISTINCT subject_id) as total_subjects,
+                   COUNT(DISTINCT semester_id) as total_semesters
+            FROM {results_source(filters)} 
+            {filter_query}
+        """, params)
+        stats = cur.fetchone() or {}
+        cur.close()
+        return {
+            'total_students': stats.get('total_students') or 0,
+            'total_subjects': stats.get('total_subjects') or 0,
+            'total_semesters': stats.get('total_semesters') or 0,
+        }
+    return cached_stat(('dashboard_totals', semester_filter, branch_filter), load)
+
+def get_dashboard_semesters(semester_filter='', branch_filter=''):
+    """Semesters that have rows under a dashboard filter, one section each"""
+    def load():
+        filter_query, params = build_results_filter({'semester': semester_filter, 'branch': branch_filter})
+        cur = db.connection.cursor(dictionary=True)
+        cur.execute(f"SELECT DISTINCT semester_id FROM analytics_rollup {filter_query}", params)
+        semesters = sorted(r['semester'] for r in decode_dimensions(cur.fetchall()))
+        cur.close()
+        return semesters
+    return cached_stat(('dashboard_semesters', semester_filter, branch_filter), load)
+
+def count_results(filter_query, params, source='students'):
+    """Row count for a results filter"""
+    cur = db.connection.cursor(dictionary=True)
+    cur.execute(f"SELECT COUNT(*) as total FROM {source} {filter_query}", params)
+    total = cur.fetchone()['total']
+    cur.close()
+    return total
+
+# ==========================================
+# BACKGROUND JOBS
+# ==========================================
+
+_job_executor = None
+_job_executor_lock = threading.Lock()
+
+def get_job_executor():
+    """Create the shared worker pool on first use, failing any jobs a previous process left unfinished"""
+    global _job_executor
+    with _job_executor_lock:
+        if _job_executor is None:
+            _job_executor = ThreadPoolExecutor(max_workers=app.config['JOB_WORKERS'],
+                                               thread_name_prefix='sras-job')
+            try:
+                cur = db.connection.cursor()
+                cur.execute("""
+                    UPDATE jobs SET status = 'failed', message = 'Interrupted by server restart', finished_at = NOW()
+                    WHERE status IN ('queued', 'running')
+                """)
+                db.connection.commit()
+                cur.close()
+            except Exception:
+                metrics.error('job_recovery')
+        return _job_executor
+
+def update_job(job_id, **fields):
+    """
+    Persist job fields on a dedicated connection, so progress updates never commit
+    (or wait on) the job's own open transaction.
+    """
+    conn = db.connect()
+    try:
+        cur = conn.cursor()
+        assignments = ', '.join(f'{field} = %s' for field in fields)
+        cur.execute(f"UPDATE jobs SET {assignments} WHERE id = %s", list(fields.values()) + [job_id])
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+def submit_job(kind, func, *args):
+    """
+    Record a queued job and hand it to the worker pool. func is called as
+    func(progress, *args) inside an app context and returns a JSON-able report.
+    Returns the new job id.
+    """
+    executor = get_job_executor()
+    job_id = uuid.uuid4().hex
+
+    cur = db.connection.cursor()
+    cur.execute("""
+        INSERT INTO jobs (id, kind, status, created_by)
+        VALUES (%s, %s, 'queued', %s)
+    """, (job_id, kind, session.get('username')))
+    db.connection.commit()
+    cur.close()
+
+    executor.submit(_run_job, job_id, func, args)
+    return job_id
+
+def _run_job(job_id, func, args):
+    """Worker entry point: run a job and record its progress and outcome"""
+    with app.app_context():
+        started = time.perf_counter()
+        last_update = [0.0]
+
+        def progress(processed, total=None):
+            # Throttle writes to the jobs table to JOB_PROGRESS_INTERVAL seconds
+            now = time.perf_counter()
+            if now - last_update[0] < app.config['JOB_PROGRESS_INTERVAL']:
+                return
+            last_update[0] = now
+            elapsed = now - started
+            update_job(job_id, processed=processed, total=total,
+                       rows_per_sec=processed / elapsed if elapsed > 0 else 0)
+
+        try:
+            update_job(job_id, status='running', started_at=datetime.now())
+            report = func(progress, *args)
+            errors = report.get('errors', [])
+            update_job(job_id, status='done', finished_at=datetime.now(),
+                       processed=report.get('processed', report.get('inserted', 0)),
+                       total=report.get('processed', report.get('inserted', 0)),
+                       rows_per_sec=report.get('rows_per_sec', 0),
+                       message=report.get('message', ''),
+                       errors=json.dumps(errors[:app.config['JOB_MAX_ERROR_ROWS']]),
+                       error_count=report.get('error_count', len(errors)))
+        except Exception as e:
+            metrics.error('job')
+            try:
+                update_job(job_id, status='failed', finished_at=datetime.now(), message=str(e))
+            except Exception:
+                metrics.error('job_update')
+
+def run_upload(filepath, grading_type, mode='upsert', delete_missing=False, progress=None):
+    """
+    Ingest an uploaded sheet. Upserts read the file chunk by chunk; plain inserts stream
+    files over STREAM_UPLOAD_THRESHOLD and load smaller ones in one transaction.
+    """
+    if mode == 'upsert':
+        return upsert_results(iter_result_chunks(filepath, app.config['STREAM_CHUNK_ROWS']),
+                              grading_type, delete_missing, progress)
+    if os.path.getsize(filepath) > app.config['STREAM_UPLOAD_THRESHOLD']:
+        return ingest_results_streaming(filepath, grading_type, progress)
+    df = read_result_sheet(filepath)
+    return ingest_results(df, grading_type, progress)
+
+def upload_job(progress, filepath, grading_type, mode='upsert', delete_missing=False):
+    """Background job body for upload_results"""
+    try:
+        report = run_upload(filepath, grading_type, mode, delete_missing, progress)
+    finally:
+        os.remove(filepath)
+    report.setdefault('processed', report['inserted'] + report['error_count'])
+    report['message'] = ingest_summary(report)
+    return report
+
+def regrade_job(progress, semester, subject):
+    """Background job body for apply_relative_grading_route (subject None means every subject)"""
+    started = time.perf_counter()
+    if subject is None:
+        updated, subject_count = apply_relative_grading_semester(semester)
+        message = f'Relative grading applied to {subject_count} subjects! {updated} records updated.'
+    else:
+        updated = apply_relative_grading(semester, subject)
+        message = f'Relative grading applied! {updated} records updated.'
+    elapsed = time.perf_counter() - started
+    return {
+        'processed': updated,
+        'rows_per_sec': updated / elapsed if elapsed > 0 else 0,
+        'message': message,
+    }
+
+# ==========================================
+# RESULT SNAPSHOT CACHE
+# ==========================================
+
+def data_version():
+    """Version of the result data, advanced by every write to students (see bump_analytics_version)"""
+    cur = db.connection.cursor()
+    cur.execute("SELECT version FROM app_state WHERE name = 'analytics'")
+    row = cur.fetchone()
+    cur.close()
+    return row[0] if row else 0
+
+def cache_args(args):
+    """
+    Query args identifying a cached payload: without jQuery's `_` cache-buster or the
+    DataTables draw counter, which differ on every request
+    """
+    return {name: value for name, value in args.items() if name not in ('_', 'draw')}
+
+def snapshot_key(kind, version, args):
+    """(cache key, ETag) for the kind of payload identified by args at a data version"""
+    digest = hashlib.sha1(json.dumps(args, sort_keys=True).encode()).hexdigest()[:20]
+    return f'{kind}:{version}:{digest}', f'{kind}-{version}-{digest}'
+
+def not_modified(etag):
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
+def snapshot_response(kind, args, loader, draw=None):
+    """
+    Serve the JSON payload identified by kind and args through result_cache.
+    loader() returns (payload, status) and only status 200 payloads are cached.
+    Responses carry an ETag, and a matching If-None-Match gets a 304 before any
+    cache or database work. DataTables requests pass draw instead: their payload
+    is cached without it and answered unconditionally, since a 304 would replay
+    a stale draw counter.
+    """
+    key, etag = snapshot_key(kind, data_version(), args)
+    if draw is None and request.if_none_match.contains(etag):
+        metrics.cache(kind, 'not_modified')
+        return not_modified(etag)
+
+    body = result_cache.get(key)
+    if body is None:
+        metrics.cache(kind, 'miss')
+        payload, status = loader()
+        if status != 200:
+            return jsonify(payload), status
+        body = app.json.dumps(payload).encode()
+        result_cache.set(key, body)
+    else:
+        metrics.cache(kind, 'hit')
+
+    if draw is not None:
+        # Splice the request's draw counter into the cached object
+        return app.response_class(b'{"draw": %d, ' % draw + body[1:], mimetype='application/json')
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def page_etag(kind, args):
+    """
+    ETag for an HTML page that only depends on the data version, the viewer's role
+    and args; None while flashed messages are pending, since those must be rendered
+    """
+    if '_flashes' in session:
+        return None
+    return snapshot_key(kind, data_version(), dict(args, role=session.get('role')))[1]
+
+# ==========================================
+# RESULT PAGINATION
+# ==========================================
+
+RESULT_FIELDS = ['roll_number', 'name', 'branch', 'semester', 'subject', 'marks', 'grade', 'grade_point']
+# Columns selected for RESULT_FIELDS; decode_dimensions turns the ids back into names
+RESULT_SELECT = ['roll_number', 'name', 'branch_id', 'semester_id', 'subject_id', 'marks', 'grade', 'grade_point']
+SEARCH_FIELDS = ['roll_number', 'name', 'grade']
+SEARCH_DIMENSIONS = ['branch', 'subject']
+# The default order runs on dimension ids, i.e. in the order names were first stored
+KEYSET_ORDER = ['semester_id', 'branch_id', 'roll_number', 'subject_id', 'id']
+
+def encode_cursor(row):
+    """Opaque keyset cursor for the row a page ended on"""
+    key = [row[field] for field in KEYSET_ORDER]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_cursor(cursor):
+    return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+
+def build_keyset_query(filter_query, params, limit, after=None, source='students'):
+    """SQL and params for up to limit rows of source in the default results order after a cursor"""
+    params = list(params)
+    if after:
+        filter_query += f" AND ({', '.join(KEYSET_ORDER)}) > ({', '.join(['%s'] * len(KEYSET_ORDER))})"
+        params += decode_cursor(after)
+
+    query = f"""
+        SELECT id, {', '.join(RESULT_SELECT)}
+        FROM {source} 
+        {filter_query}
+        ORDER BY {', '.join(KEYSET_ORDER)}
+        LIMIT %s
+    """
+    return query, params + [limit]
+
+def keyset_page(filter_query, params, length, after=None, source='students'):
+    """
+    Fetch one page in the default results order, starting after a cursor.
+    The row-value comparison lets MySQL seek straight to the page in the index
+    instead of scanning and discarding OFFSET rows.
+    """
+    query, params = build_keyset_query(filter_query, params, length + 1, after, source)
+    cur = db.connection.cursor(dictionary=True)
+    cur.execute(query, params)
+    rows = list(cur.fetchall())
+    cur.close()
+    return keyset_payload(rows, length)
+
+def keyset_payload(rows, length):
+    """Page JSON from the up to length + 1 dict rows a build_keyset_query statement returned"""
+    next_cursor = encode_cursor(rows[length - 1]) if len(rows) > length else None
+    rows = rows[:length]
+    for row in rows:
+        del row['id']
+    return {'data': decode_dimensions(rows), 'next': next_cursor}
+
+def datatables_page(filter_query, params, args, source='students'):
+    """
+    Answer a DataTables server-side processing request (draw/start/length/search/order)
+    for the rows matching a results filter.
+    """
+    draw = int(args.get('draw', 0))
+    start = max(int(args.get('start', 0)), 0)
+    length = int(args.get('length', app.config['RESULTS_PAGE_SIZE']))
+    if length <= 0 or length > app.config['RESULTS_PAGE_MAX']:
+        length = app.config['RESULTS_PAGE_MAX']
+
+    search_query, search_params = filter_query, list(params)
+    search = args.get('search[value]', '').strip()
+    if search:
+        clauses = [f"{field} LIKE %s" for field in SEARCH_FIELDS]
+        search_params += [f'%{search}%'] * len(SEARCH_FIELDS)
+        # Branch and subject names are matched in the dimension cache, then by id
+        for kind in SEARCH_DIMENSIONS:
+            ids = search_dimension(kind, search)
+            if ids:
+                clauses.append(f"{kind}_id IN ({', '.join(['%s'] * len(ids))})")
+                search_params += ids
+        search_query += " AND (" + " OR ".join(clauses) + ")"
+
+    # Branch, semester and subject sort by name, through a join to their dimension table
+    order = []
+    joins = {}
+    i = 0
+    while f'order[{i}][column]' in args:
+        column = args.get(f"columns[{args.get(f'order[{i}][column]')}][data]")
+        direction = 'DESC' if args.get(f'order[{i}][dir]') == 'desc' else 'ASC'
+        if column in DIMENSION_TABLES:
+            joins[column] = f"JOIN {DIMENSION_TABLES[column]} {column}_dim ON {column}_dim.id = f.{column}_id"
+            order.append((f'{column}_dim.name', direction))
+        elif column in RESULT_FIELDS:
+            order.append((f'f.{column}', direction))
+        i += 1
+    if not order:
+        order = [(f'f.{field}', 'ASC') for field in KEYSET_ORDER[:-1]]
+    order.append(('f.id', 'ASC'))
+
+    records_total = cached_stat(('results_count', source, filter_query, tuple(params)),
+                                lambda: count_results(filter_query, params, source))
+    records_filtered = count_results(search_query, search_params, source) if search else records_total
+
+    # Deferred join: page through the narrow index for ids first, then fetch only those rows
+    cur = db.connection.cursor(dictionary=True)
+    cur.execute(f"""
+        SELECT {', '.join(f's.{field}' for field in RESULT_SELECT)}
+        FROM {source} s
+        JOIN (
+            SELECT f.id, {', '.join(f'{key} AS sort_{n}' for n, (key, _) in enumerate(order))}
+            FROM (SELECT id, {', '.join(RESULT_SELECT)} FROM {source} {search_query}) f
+            {' '.join(joins.values())}
+            ORDER BY {', '.join(f'{key} {direction}' for key, direction in order)}
+            LIMIT %s OFFSET %s
+        ) page ON s.id = page.id
+        ORDER BY {', '.join(f'page.sort_{n} {direction}' for n, (_, direction) in enumerate(order))}
+    """, search_params + [length, start])
+    rows = cur.fetchall()
+    cur.close()
+
+    return {
+        'draw': draw,
+        'recordsTotal': records_total,
+        'recordsFiltered': records_filtered,
+        'data': decode_dimensions(list(rows)),
+    }
+
+# ==========================================
+# RESULT EXPORT
+# ==========================================
+
+EXPORT_HEADERS = ['Roll No', 'Name', 'Branch', 'Semester', 'Subject', 'Marks', 'Grade', 'GP']
+
+def iter_export_rows(filter_query, params, source='students'):
+    """Filtered results in the default order, read from an unbuffered cursor a batch at a time"""
+    # The connection can't run another query while the stream is open, so decode from
+    # dimension maps loaded up front instead of through the lazily reloading cache
+    names = {}
+    for kind in DIMENSION_TABLES:
+        load_dimension(kind)
+        names[kind] = _dimensions[kind]['names']
+    cur = db.connection.cursor(stream=True)
+    try:
+        cur.execute(f"""
+            SELECT {', '.join(RESULT_SELECT)}
+            FROM {source} 
+            {filter_query}
+            ORDER BY {', '.join(KEYSET_ORDER)}
+        """, params)
+        while True:
+            rows = cur.fetchmany(app.config['EXPORT_FETCH_ROWS'])
+            if not rows:
+                break
+            for row in rows:
+                for kind in DIMENSION_TABLES:
+                    row[kind] = names[kind].get(row.pop(f'{kind}_id'))
+                yield [row[field] for field in RESULT_FIELDS]
+    finally:
+        cur.close()
+
+def stream_results_csv(rows):
+    """CSV text generator, one chunk per EXPORT_FETCH_ROWS rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADERS)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % app.config['EXPORT_FETCH_ROWS'] == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def write_results_xlsx(rows):
+    """Write rows to a temporary .xlsx with openpyxl's write-only workbook; returns its path"""
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet('Results')
+    ws.append(EXPORT_HEADERS)
+    for row in rows:
+        ws.append(row)
+
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        wb.save(path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+def stream_file(path, chunk_size=64 * 1024):
+    """Yield a file in chunks and delete it once sent"""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
 
 # Admin required decorator
 def admin_required(f):
@@ -149,25 +1944,53 @@ def login():
             flash('Please provide both username and password', 'error')
             return render_template('login.html')
 
+        # Limits are checked before any hashing, so throttled attempts cost nothing
+        user_key = username.lower()
+        wait = max(user_login_limiter.retry_after(user_key), ip_login_limiter.retry_after(request.remote_addr))
+        if wait:
+            wait = math.ceil(wait)
+            flash(f'Too many login attempts. Please try again in {wait} seconds.', 'error')
+            return render_template('login.html'), 429, {'Retry-After': str(wait)}
+
         try:
-            cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+            cur = db.connection.cursor(dictionary=True)
             cur.execute("SELECT * FROM users WHERE username=%s", (username,))
             user = cur.fetchone()
             cur.close()
 
-            if user and check_password_hash(user['password'], password):
+            if passwords.verify(user['password'] if user else None, password):
+                user_login_limiter.reset(user_key)
+                if passwords.needs_rehash(user['password']):
+                    rehash_password(user['id'], password)
                 session['user_id'] = user['id']
                 session['username'] = user['username']
                 session['role'] = user['role']
                 flash(f'Welcome back, {username}!', 'success')
                 return redirect('/dashboard' if user['role'] == 'admin' else '/results')
             else:
+                user_login_limiter.hit(user_key)
+                ip_login_limiter.hit(request.remote_addr)
                 flash('Invalid username or password', 'error')
+        except HasherBusy:
+            flash('The server is busy, please try again in a moment.', 'error')
+            return render_template('login.html'), 503, {'Retry-After': '1'}
         except Exception as e:
+            metrics.error()
             flash(f'Login error: {str(e)}', 'error')
 
     return render_template('login.html')
 
+def rehash_password(user_id, password):
+    """Re-hash a just-verified password with the current PASSWORD_HASH_METHOD; failures keep the old hash"""
+    try:
+        cur = db.connection.cursor()
+        cur.execute("UPDATE users SET password = %s WHERE id = %s", (passwords.hash(password), user_id))
+        db.connection.commit()
+        cur.close()
+    except Exception:
+        db.connection.rollback()
+        metrics.error('rehash')
+
 @app.route('/logout')
 def logout():
     username = session.get('username', 'User')
@@ -197,32 +2020,31 @@ def add_student():
                 flash('Marks must be between 0 and 100 (or -1 for absent)', 'error')
                 return render_template('add_student.html')
 
-            # Calculate grade based on selected method
+            # Relative grades come from the in-memory cohort index, which also re-grades
+            # the stored students whose band the new mark changes
             if grading_type == 'relative':
-                # Get existing marks for relative grading
-                cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-                cur.execute("""
-                    SELECT marks FROM students 
-                    WHERE semester = %s AND subject = %s AND marks >= 0
-                """, (semester, subject))
-                existing_marks = [r['marks'] for r in cur.fetchall()]
-                existing_marks.append(marks)
-                grade, grade_point = calculate_relative_grade(existing_marks, marks)
-                cur.close()
+                record = (roll_number, name, semester, subject, marks, '', 0, branch)
+                rows = encode_dimensions(pd.DataFrame([record], columns=STUDENT_FIELDS))
+                regraded = insert_relative_student(rows)
             else:
                 grade, grade_point = calculate_absolute_grade(marks)
+                record = (roll_number, name, semester, subject, marks, grade, grade_point, branch)
+                rows = encode_dimensions(pd.DataFrame([record], columns=STUDENT_FIELDS))
+                cur = db.connection.cursor()
+                bulk_insert_students(cur, rows, grading_type)
+                after_students_inserted(rows)
+                db.connection.commit()
+                students_changed()
+                cur.close()
+                regraded = 0
 
-            cur = mysql.connection.cursor()
-            cur.execute("""
-                INSERT INTO students (roll_number, name, semester, subject, marks, grade, grade_point, branch)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-            """, (roll_number, name, semester, subject, marks, grade, grade_point, branch))
-            mysql.connection.commit()
-            cur.close()
-
-            flash(f'Student record for {name} added successfully!', 'success')
+            message = f'Student record for {name} added successfully!'
+            if regraded:
+                message += f' {regraded} existing grades changed.'
+            flash(message, 'success')
             return redirect('/dashboard')
         except Exception as e:
+            metrics.error()
             flash(f'Error adding student: {str(e)}', 'error')
 
     return render_template('add_student.html')
@@ -237,6 +2059,8 @@ def upload_results():
 
         file = request.files['file']
         grading_type = request.form.get('grading_type', 'absolute')
+        mode = 'insert' if request.form.get('mode') == 'insert' else 'upsert'
+        delete_missing = mode == 'upsert' and request.form.get('delete_missing') == 'on'
         
         if file.filename == '':
             flash('No file selected!', 'error')
@@ -248,84 +2072,32 @@ def upload_results():
 
         try:
             os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
+            # Unique prefix so queued uploads with the same name don't overwrite each other
+            filepath = os.path.join(app.config['UPLOAD_FOLDER'], f'{uuid.uuid4().hex}_{secure_filename(file.filename)}')
             file.save(filepath)
 
-            if file.filename.endswith('.csv'):
-                df = pd.read_csv(filepath)
-            else:
-                df = pd.read_excel(filepath)
-
-            required_columns = ['Roll Number', 'Name', 'Semester', 'Subject', 'Marks', 'Branch']
-            if not all(col in df.columns for col in required_columns):
-                flash(f'Invalid file format! Required columns: {", ".join(required_columns)}', 'error')
+            # Check the header before parsing any data rows
+            columns = read_result_header(filepath)
+            if not all(col in columns for col in RESULT_COLUMNS):
+                flash(f'Invalid file format! Required columns: {", ".join(RESULT_COLUMNS)}', 'error')
                 os.remove(filepath)
                 return redirect('/upload_results')
 
-            cur = mysql.connection.cursor()
-            success_count = 0
-            error_count = 0
+            if app.config['BACKGROUND_JOBS']:
+                job_id = submit_job('upload', upload_job, filepath, grading_type, mode, delete_missing)
+                flash(f'Upload queued as job {job_id}. Progress is shown below.', 'info')
+                return redirect(f'/dashboard?job={job_id}')
 
-            # Group by semester and subject for relative grading
-            if grading_type == 'relative':
-                grouped = df.groupby(['Semester', 'Subject'])
-                for (sem, subj), group in grouped:
-                    marks_list = group['Marks'].tolist()
-                    for idx, row in group.iterrows():
-                        try:
-                            roll = str(row['Roll Number']).strip()
-                            name = str(row['Name']).strip()
-                            marks = float(row['Marks'])
-                            branch = str(row['Branch']).strip()
-
-                            if marks < -1 or marks > 100:
-                                error_count += 1
-                                continue
-
-                            grade, grade_point = calculate_relative_grade(marks_list, marks)
-                            
-                            cur.execute("""
-                                INSERT INTO students (roll_number, name, semester, subject, marks, grade, grade_point, branch)
-                                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                            """, (roll, name, sem, subj, marks, grade, grade_point, branch))
-                            success_count += 1
-                        except Exception as e:
-                            error_count += 1
-                            print(f"Error on row {idx}: {str(e)}")
-            else:
-                # Absolute grading
-                for idx, row in df.iterrows():
-                    try:
-                        roll = str(row['Roll Number']).strip()
-                        name = str(row['Name']).strip()
-                        sem = str(row['Semester']).strip()
-                        subj = str(row['Subject']).strip()
-                        marks = float(row['Marks'])
-                        branch = str(row['Branch']).strip()
-
-                        if marks < -1 or marks > 100:
-                            error_count += 1
-                            continue
-
-                        grade, grade_point = calculate_absolute_grade(marks)
-                        
-                        cur.execute("""
-                            INSERT INTO students (roll_number, name, semester, subject, marks, grade, grade_point, branch)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (roll, name, sem, subj, marks, grade, grade_point, branch))
-                        success_count += 1
-                    except Exception as e:
-                        error_count += 1
-                        print(f"Error on row {idx}: {str(e)}")
-
-            mysql.connection.commit()
-            cur.close()
-            os.remove(filepath)
+            try:
+                report = run_upload(filepath, grading_type, mode, delete_missing)
+            finally:
+                os.remove(filepath)
 
-            flash(f'Upload complete! {success_count} records added, {error_count} errors.', 'success')
+            flash_ingest_report(report)
             return redirect('/dashboard')
 
         except Exception as e:
+            metrics.error()
             flash(f'Error processing file: {str(e)}', 'error')
 
     return render_template('upload_results.html')
@@ -342,52 +2114,30 @@ def show_results():
         subject_filter = request.args.get('subject', '')
         branch_filter = request.args.get('branch', '')
         
-        # Base query
-        query = """
-            SELECT roll_number, name, semester, subject, marks, grade, grade_point, branch 
-            FROM students 
-            WHERE 1=1
-        """
-        params = []
-        
-        # Add filters
-        if semester_filter:
-            query += " AND semester = %s"
-            params.append(semester_filter)
-        if subject_filter:
-            query += " AND subject = %s"
-            params.append(subject_filter)
-        if branch_filter:
-            query += " AND branch = %s"
-            params.append(branch_filter)
+        # The page only changes with the data, the filters and the viewer's role
+        etag = page_etag('results_page', request.args.to_dict())
+        if etag and request.if_none_match.contains(etag):
+            metrics.cache('results_page', 'not_modified')
+            return not_modified(etag)
         
-        query += " ORDER BY semester, branch, roll_number, subject"
+        # Rows are loaded page by page from /api/results; only filter options are needed here
+        options = get_filter_options()
         
-        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        cur.execute(query, params)
-        data = cur.fetchall()
-        
-        # Get unique values for filters
-        cur.execute("SELECT DISTINCT semester FROM students ORDER BY semester")
-        semesters = [r['semester'] for r in cur.fetchall()]
-        
-        cur.execute("SELECT DISTINCT subject FROM students ORDER BY subject")
-        subjects = [r['subject'] for r in cur.fetchall()]
-        
-        cur.execute("SELECT DISTINCT branch FROM students ORDER BY branch")
-        branches = [r['branch'] for r in cur.fetchall()]
-        
-        cur.close()
-        
-        return render_template('results.html', 
-                             data=data,
-                             semesters=semesters,
-                             subjects=subjects,
-                             branches=branches,
-                             current_semester=semester_filter,
-                             current_subject=subject_filter,
-                             current_branch=branch_filter)
+        response = app.make_response(render_template(
+            'results.html',
+            semesters=options['semesters'],
+            subjects=options['subjects'],
+            branches=options['branches'],
+            current_semester=semester_filter,
+            current_subject=subject_filter,
+            current_branch=branch_filter))
+        if etag:
+            response.set_etag(etag)
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+        return response
     except Exception as e:
+        metrics.error()
         flash(f'Error loading results: {str(e)}', 'error')
         return redirect('/dashboard')
 
@@ -399,67 +2149,190 @@ def dashboard():
         semester_filter = request.args.get('semester', '')
         branch_filter = request.args.get('branch', '')
         
-        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
-        
-        # Base query with filters
-        filter_query = "WHERE 1=1"
-        params = []
-        if semester_filter:
-            filter_query += " AND semester = %s"
-            params.append(semester_filter)
-        if branch_filter:
-            filter_query += " AND branch = %s"
-            params.append(branch_filter)
-        
-        # Get all student records
-        cur.execute(f"""
-            SELECT roll_number, name, semester, subject, marks, grade, grade_point, branch 
-            FROM students 
-            {filter_query}
-            ORDER BY semester, branch, name
-        """, params)
-        rows = cur.fetchall()
-        
-        # Get statistics
-        cur.execute(f"SELECT COUNT(DISTINCT roll_number) as total_students FROM students {filter_query}", params)
-        stats = cur.fetchone()
-        total_students = stats['total_students'] if stats else 0
-        
-        cur.execute(f"SELECT COUNT(DISTINCT subject) as total_subjects FROM students {filter_query}", params)
-        stats = cur.fetchone()
-        total_subjects = stats['total_subjects'] if stats else 0
-        
-        cur.execute(f"SELECT COUNT(DISTINCT semester) as total_semesters FROM students {filter_query}", params)
-        stats = cur.fetchone()
-        total_semesters = stats['total_semesters'] if stats else 0
-        
-        # Get filter options
-        cur.execute("SELECT DISTINCT semester FROM students ORDER BY semester")
-        semesters = [r['semester'] for r in cur.fetchall()]
-        
-        cur.execute("SELECT DISTINCT branch FROM students ORDER BY branch")
-        branches = [r['branch'] for r in cur.fetchall()]
-        
-        cur.close()
+        # Get statistics and filter options (cached until the next write)
+        totals = get_dashboard_totals(semester_filter, branch_filter)
+        options = get_filter_options()
 
-        # Organize data by semester
-        semester_data = defaultdict(list)
-        for row in rows:
-            semester_data[row['semester']].append(row)
+        # Each semester's table is loaded lazily from /api/results
+        semester_sections = get_dashboard_semesters(semester_filter, branch_filter)
 
         return render_template('dashboard.html', 
-                             semester_data=dict(semester_data),
-                             total_students=total_students,
-                             total_subjects=total_subjects,
-                             total_semesters=total_semesters,
-                             semesters=semesters,
-                             branches=branches,
+                             semester_sections=semester_sections,
+                             total_students=totals['total_students'],
+                             total_subjects=totals['total_subjects'],
+                             total_semesters=totals['total_semesters'],
+                             semesters=options['semesters'],
+                             branches=options['branches'],
                              current_semester=semester_filter,
-                             current_branch=branch_filter)
+                             current_branch=branch_filter,
+                             job_id=request.args.get('job', ''))
     except Exception as e:
+        metrics.error()
         flash(f'Error loading dashboard: {str(e)}', 'error')
         return redirect('/login')
 
+@app.route('/api/results')
+def results_api():
+    if 'user_id' not in session:
+        return jsonify({'error': 'Please login to view results'}), 401
+
+    try:
+        # DataTables server-side requests carry a draw counter; everything else gets keyset pages
+        if 'draw' in request.args:
+            def load_datatables():
+                filter_query, params = build_results_filter(request.args)
+                page = datatables_page(filter_query, params, request.args, results_source(request.args))
+                del page['draw']
+                return page, 200
+            return snapshot_response('datatables', cache_args(request.args), load_datatables,
+                                     draw=int(request.args['draw']))
+        
+        length = int(request.args.get('length', app.config['RESULTS_PAGE_SIZE']))
+        length = min(max(length, 1), app.config['RESULTS_PAGE_MAX'])
+
+        def load_page():
+            filter_query, params = build_results_filter(request.args)
+            return keyset_page(filter_query, params, length, request.args.get('after'),
+                               results_source(request.args)), 200
+        return snapshot_response('results', dict(cache_args(request.args), length=length), load_page)
+    except Exception as e:
+        metrics.error()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/results/export')
+def export_results():
+    if 'user_id' not in session:
+        flash('Please login to view results', 'error')
+        return redirect('/login')
+
+    try:
+        export_format = request.args.get('format', 'csv')
+        if export_format not in ('csv', 'xlsx'):
+            flash('Export format must be csv or xlsx', 'error')
+            return redirect('/results')
+
+        filter_query, params = build_results_filter(request.args)
+        source = results_source(request.args)
+        parts = [request.args.get(field) for field in ('semester', 'subject', 'branch') if request.args.get(field)]
+        filename = secure_filename(f"results_{'_'.join(parts)}" if parts else 'student_results')
+        headers = {'Content-Disposition': f'attachment; filename="{filename}.{export_format}"'}
+
+        if export_format == 'csv':
+            rows = iter_export_rows(filter_query, params, source)
+            return Response(stream_with_context(stream_results_csv(rows)),
+                            mimetype='text/csv', headers=headers)
+
+        # The .xlsx zip container needs the whole sheet before its first byte, so it is built on disk first
+        path = write_results_xlsx(iter_export_rows(filter_query, params, source))
+        headers['Content-Length'] = str(os.path.getsize(path))
+        return Response(stream_file(path), headers=headers,
+                        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    except Exception as e:
+        metrics.error()
+        flash(f'Error exporting results: {str(e)}', 'error')
+        return redirect('/results')
+
+def load_transcript(roll_number):
+    """Transcript payload for student_transcript, as (payload, status)"""
+    cur = db.connection.cursor(dictionary=True)
+    
+    # Per-semester SGPA and class rank come precomputed from the summary table
+    cur.execute("""
+        SELECT semester_id, branch_id, name, subjects, credits, grade_points, sgpa, class_rank, class_size
+        FROM student_semester_summary 
+        WHERE roll_number = %s
+    """, (roll_number,))
+    semesters = sorted(decode_dimensions(cur.fetchall()), key=lambda sem: sem['semester'])
+    
+    if not semesters:
+        cur.close()
+        return {'error': 'Student not found'}, 404
+    
+    # A transcript spans every semester, archived ones included: one indexed lookup per table
+    tables = ['students', 'students_archive'] if archived_semester_ids() else ['students']
+    cur.execute(" UNION ALL ".join(f"""
+        SELECT semester_id, subject_id, marks, grade, grade_point 
+        FROM {table} 
+        WHERE roll_number = %s
+    """ for table in tables), (roll_number,) * len(tables))
+    subjects = defaultdict(list)
+    for row in sorted(decode_dimensions(cur.fetchall()), key=lambda r: (r['semester'], r['subject'])):
+        subjects[row['semester']].append(row)
+    cur.close()
+    
+    for sem in semesters:
+        sem['results'] = subjects.get(sem['semester'], [])
+    
+    total_credits = sum(sem['credits'] for sem in semesters)
+    total_points = sum(sem['grade_points'] for sem in semesters)
+    
+    return {
+        'roll_number': roll_number,
+        'name': semesters[-1]['name'],
+        'branch': semesters[-1]['branch'],
+        'cgpa': round(float(total_points) / total_credits, 2) if total_credits else None,
+        'credits': total_credits,
+        'semesters': semesters
+    }, 200
+
+@app.route('/api/students/<roll_number>/transcript')
+def student_transcript(roll_number):
+    if 'user_id' not in session:
+        return jsonify({'error': 'Please login to view results'}), 401
+
+    try:
+        return snapshot_response('transcript', {'roll_number': roll_number},
+                                 lambda: load_transcript(roll_number))
+    except Exception as e:
+        metrics.error()
+        return jsonify({'error': str(e)}), 500
+
+def analytics_validators(state, semester_filter, branch_filter):
+    """(ETag, Last-Modified) of an /api/analytics response, from the ANALYTICS_STATE_SQL row (None if unset)"""
+    state = state or {'version': 0, 'updated_at': None}
+    # Filters are hashed into the tag, so quotes or other characters in them can't break the header
+    _, etag = snapshot_key('analytics', state['version'], {'semester': semester_filter, 'branch': branch_filter})
+    return etag, state['updated_at']
+
+def analytics_queries(semester_filter='', branch_filter='', resolve=dimension_id):
+    """(name, sql, params) of the analytics_rollup queries behind /api/analytics"""
+    filter_query, params = build_results_filter({'semester': semester_filter, 'branch': branch_filter},
+                                                resolve=resolve)
+    branch_query, branch_params = build_results_filter({'branch': branch_filter}, resolve=resolve)
+    # Everything reads pre-aggregated analytics_rollup rows, not students
+    return [
+        ('grade_distribution', f"""
+            SELECT grade, SUM(row_count) as count 
+            FROM analytics_rollup 
+            {filter_query} AND grade != 'AB'
+            GROUP BY grade
+            HAVING count > 0
+        """, params),
+        ('subject_averages', f"""
+            SELECT subject_id, SUM(marks_sum) / SUM(marks_count) as avg_marks 
+            FROM analytics_rollup 
+            {filter_query}
+            GROUP BY subject_id
+            HAVING SUM(marks_count) > 0
+        """, params),
+        ('semester_performance', f"""
+            SELECT semester_id, SUM(marks_sum) / SUM(marks_count) as avg_marks, SUM(marks_count) as total_students
+            FROM analytics_rollup 
+            {branch_query}
+            GROUP BY semester_id
+            HAVING SUM(marks_count) > 0
+        """, branch_params),
+    ]
+
+def analytics_payload(results):
+    """/api/analytics JSON from the dict rows of each analytics_queries query"""
+    return {
+        'grade_distribution': results['grade_distribution'],
+        'subject_averages': sorted(decode_dimensions(results['subject_averages']), key=lambda r: r['subject']),
+        'semester_performance': sorted(decode_dimensions(results['semester_performance']),
+                                       key=lambda r: r['semester']),
+    }
+
 @app.route('/api/analytics')
 @admin_required
 def analytics():
@@ -468,52 +2341,114 @@ def analytics():
         semester_filter = request.args.get('semester', '')
         branch_filter = request.args.get('branch', '')
         
-        filter_query = "WHERE grade != 'AB'"
-        params = []
-        if semester_filter:
-            filter_query += " AND semester = %s"
-            params.append(semester_filter)
-        if branch_filter:
-            filter_query += " AND branch = %s"
-            params.append(branch_filter)
-        
-        cur = mysql.connection.cursor(MySQLdb.cursors.DictCursor)
+        cur = db.connection.cursor(dictionary=True)
         
-        # Grade distribution
-        cur.execute(f"""
-            SELECT grade, COUNT(*) as count 
-            FROM students 
-            {filter_query}
-            GROUP BY grade
-        """, params)
-        grade_dist = cur.fetchall()
-        
-        # Subject-wise average
-        cur.execute(f"""
-            SELECT subject, AVG(marks) as avg_marks 
-            FROM students 
-            WHERE marks >= 0 {' AND semester = %s' if semester_filter else ''} {' AND branch = %s' if branch_filter else ''}
-            GROUP BY subject
-        """, params)
-        subject_avg = cur.fetchall()
+        # Answer conditional requests before touching the rollups
+        cur.execute(ANALYTICS_STATE_SQL)
+        etag, last_modified = analytics_validators(cur.fetchone(), semester_filter, branch_filter)
+        if request.if_none_match.contains(etag):
+            cur.close()
+            return not_modified(etag)
         
-        # Semester-wise performance
-        cur.execute(f"""
-            SELECT semester, AVG(marks) as avg_marks, COUNT(*) as total_students
-            FROM students 
-            WHERE marks >= 0 {' AND branch = %s' if branch_filter else ''}
-            GROUP BY semester
-        """, [branch_filter] if branch_filter else [])
-        semester_perf = cur.fetchall()
+        results = {}
+        for name, query, params in analytics_queries(semester_filter, branch_filter):
+            cur.execute(query, params, name=name)
+            results[name] = cur.fetchall()
+        cur.close()
         
+        response = jsonify(analytics_payload(results))
+        # Let browsers revalidate with If-None-Match / If-Modified-Since on every dashboard load
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except Exception as e:
+        metrics.error()
+        return jsonify({'error': str(e)}), 500
+
+def load_mark_statistics(filters):
+    """
+    Mark statistics for the filtered cohorts, overall and per subject and branch,
+    merged from mark_sketch rather than read from students. Returns (payload, status).
+    """
+    filter_query, params = build_results_filter(filters)
+    cur = db.connection.cursor()
+    cur.execute(f"""
+        SELECT subject_id, branch_id, bucket, SUM(row_count)
+        FROM mark_sketch 
+        {filter_query}
+        GROUP BY subject_id, branch_id, bucket
+    """, params)
+    buckets = pd.DataFrame([tuple(int(v) for v in row) for row in cur.fetchall()],
+                           columns=['subject_id', 'branch_id', 'bucket', 'row_count'])
+    cur.close()
+
+    def breakdown(kind):
+        groups = [{kind: dimension_name(kind, key),
+                   **MarkSketch.from_buckets(group['bucket'], group['row_count']).describe()}
+                  for key, group in buckets.groupby(f'{kind}_id')]
+        return sorted(groups, key=lambda g: g[kind])
+
+    return {
+        'overall': MarkSketch.from_buckets(buckets['bucket'], buckets['row_count']).describe(),
+        'subjects': breakdown('subject'),
+        'branches': breakdown('branch'),
+    }, 200
+
+def load_cohort_statistics(filters):
+    """Exact mark statistics of one semester-subject cohort (optionally one branch). Returns (payload, status)"""
+    if not filters['semester'] or not filters['subject']:
+        return {'error': 'semester and subject are required'}, 400
+    filter_query, params = build_results_filter(filters)
+    cur = db.connection.cursor()
+    cur.execute(f"SELECT marks FROM {results_source(filters)} {filter_query}", params)
+    marks = np.array([float(m) for (m,) in cur.fetchall()], dtype=float)
+    cur.close()
+    return dict(filters, absent=int(np.count_nonzero(marks == -1)), **describe_marks(marks)), 200
+
+@app.route('/api/statistics')
+@admin_required
+def mark_statistics():
+    try:
+        filters = {field: request.args.get(field, '') for field in ('semester', 'subject', 'branch')}
+        return snapshot_response('statistics', filters, lambda: load_mark_statistics(filters))
+    except Exception as e:
+        metrics.error()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/statistics/cohort')
+@admin_required
+def cohort_statistics():
+    try:
+        filters = {field: request.args.get(field, '') for field in ('semester', 'subject', 'branch')}
+        return snapshot_response('cohort_statistics', filters, lambda: load_cohort_statistics(filters))
+    except Exception as e:
+        metrics.error()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>')
+@admin_required
+def job_status(job_id):
+    try:
+        cur = db.connection.cursor(dictionary=True)
+        cur.execute("""
+            SELECT id, kind, status, processed, total, rows_per_sec, error_count, errors, message,
+                   created_by, created_at, started_at, finished_at
+            FROM jobs WHERE id = %s
+        """, (job_id,))
+        job = cur.fetchone()
         cur.close()
         
-        return jsonify({
-            'grade_distribution': grade_dist,
-            'subject_averages': subject_avg,
-            'semester_performance': semester_perf
-        })
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        job['errors'] = json.loads(job['errors']) if job['errors'] else []
+        job['progress'] = (job['processed'] / job['total'] * 100) if job['total'] else None
+        return jsonify(job)
     except Exception as e:
+        metrics.error()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/apply_relative_grading', methods=['POST'])
@@ -522,15 +2457,26 @@ def apply_relative_grading_route():
     try:
         semester = request.form.get('semester')
         subject = request.form.get('subject')
+        all_subjects = request.form.get('all_subjects') == 'on'
         
-        if not semester or not subject:
+        if not semester or not (subject or all_subjects):
             flash('Semester and subject are required!', 'error')
             return redirect('/dashboard')
         
-        updated = apply_relative_grading(semester, subject)
-        flash(f'Relative grading applied! {updated} records updated.', 'success')
+        if app.config['BACKGROUND_JOBS']:
+            job_id = submit_job('regrade', regrade_job, semester, None if all_subjects else subject)
+            flash(f'Relative grading queued as job {job_id}.', 'info')
+            return redirect(f'/dashboard?job={job_id}')
+        
+        if all_subjects:
+            updated, subject_count = apply_relative_grading_semester(semester)
+            flash(f'Relative grading applied to {subject_count} subjects! {updated} records updated.', 'success')
+        else:
+            updated = apply_relative_grading(semester, subject)
+            flash(f'Relative grading applied! {updated} records updated.', 'success')
         return redirect('/dashboard')
     except Exception as e:
+        metrics.error()
         flash(f'Error applying relative grading: {str(e)}', 'error')
         return redirect('/dashboard')
 
@@ -550,21 +2496,24 @@ def add_user():
                 flash('Password must be at least 6 characters long!', 'error')
                 return render_template('add_user.html')
 
-            hashed_password = generate_password_hash(password)
+            hashed_password = passwords.hash(password)
 
-            cur = mysql.connection.cursor()
+            cur = db.connection.cursor()
             cur.execute("""
                 INSERT INTO users (username, password, role) 
                 VALUES (%s, %s, %s)
             """, (username, hashed_password, role))
-            mysql.connection.commit()
+            db.connection.commit()
             cur.close()
 
             flash('User registered successfully! Please login.', 'success')
             return redirect('/login')
-        except MySQLdb.IntegrityError:
+        except db.IntegrityError:
             flash('Username already exists!', 'error')
+        except HasherBusy:
+            flash('The server is busy, please try again in a moment.', 'error')
         except Exception as e:
+            metrics.error()
             flash(f'Error creating user: {str(e)}', 'error')
 
     return render_template('add_user.html')
@@ -0,0 +1,258 @@
+"""
+Async read-only tier serving /api/results (keyset pages) and /api/analytics.
+
+A plain ASGI application, run next to the Flask app with e.g.
+
+    uvicorn async_api:app --workers 2
+
+and routed GET /api/results and GET /api/analytics by the reverse proxy. A
+request waiting on the database holds no worker, so concurrency is bounded by
+ASYNC_DB_POOL_SIZE connections rather than by worker count. Responses are the
+same JSON as the Flask views: filters, SQL, the result snapshot cache, ETags
+and the Flask session cookie (for login and admin checks) are all shared with
+app.py. MySQL is queried through an aiomysql pool (optional dependency); the
+SQLite backend runs its queries on a thread pool of the same size.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl
+
+from werkzeug.http import http_date, is_resource_modified
+
+import app as flask_app
+from db import SQLiteBackend, translate_mysql_to_sqlite
+
+config = flask_app.app.config
+config.setdefault('ASYNC_DB_POOL_SIZE', 20)
+
+
+# ==========================================
+# ASYNC DATABASE
+# ==========================================
+
+class AsyncDatabase:
+    """fetchall() for the read tier over an aiomysql pool, or SQLite on a thread pool"""
+
+    def __init__(self, config):
+        self.config = config
+        self.size = config['ASYNC_DB_POOL_SIZE']
+        self.pool = None
+        self._executor = None
+        self._local = threading.local()
+
+    async def start(self):
+        if self.config['DB_BACKEND'] == 'sqlite':
+            self._sqlite = SQLiteBackend(self.config)
+            self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='sras-async-db')
+            return
+        import aiomysql
+        self.pool = await aiomysql.create_pool(
+            host=self.config['MYSQL_HOST'], user=self.config['MYSQL_USER'],
+            password=self.config['MYSQL_PASSWORD'], db=self.config['MYSQL_DB'],
+            port=self.config.get('MYSQL_PORT', 3306), charset='utf8mb4',
+            minsize=1, maxsize=self.size, autocommit=True, pool_recycle=self.config['DB_POOL_RECYCLE'])
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    async def fetchall(self, sql, params=()):
+        """Rows of a MySQL-flavoured query as dicts"""
+        if self.pool is None:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._sqlite_fetchall, sql, params)
+        import aiomysql
+        async with self.pool.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cur:
+                await cur.execute(sql, params)
+                return list(await cur.fetchall())
+
+    def _sqlite_fetchall(self, sql, params):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._sqlite.connect()
+        cur = conn.execute(translate_mysql_to_sqlite(sql), list(params))
+        columns = [column[0] for column in cur.description]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+db = AsyncDatabase(config)
+
+
+async def ensure_dimension_ids(kind, ids):
+    """Reload a dimension when rows reference ids this process has not seen yet"""
+    if any(record_id not in flask_app._dimensions[kind]['names'] for record_id in ids):
+        await reload_dimension(kind)
+
+
+async def reload_dimension(kind):
+    rows = await db.fetchall(f"SELECT id, name FROM {flask_app.DIMENSION_TABLES[kind]}")
+    flask_app.store_dimension(kind, [(row['id'], row['name']) for row in rows])
+
+
+async def resolve_filters(filters):
+    """Make sure every filter name is in the dimension cache; returns a resolve() for build_results_filter"""
+    for kind, name in filters.items():
+        if name and name not in flask_app._dimensions[kind]['ids']:
+            await reload_dimension(kind)
+    return lambda kind, name: flask_app._dimensions[kind]['ids'].get(name)
+
+
+async def results_source(filters, resolve):
+    """flask_app.results_source, reading the archived semesters through the async pool"""
+    semester = filters.get('semester', '')
+    if not semester:
+        return 'students'
+    archived = {row['id'] for row in await db.fetchall(flask_app.ARCHIVED_SEMESTERS_SQL)}
+    return flask_app.students_source(archived, resolve('semester', semester) or 0)
+
+
+async def preload_dimensions(rows):
+    """Load the dimension names rows reference, so the sync decode_dimensions finds them cached"""
+    for kind in flask_app.DIMENSION_TABLES:
+        await ensure_dimension_ids(kind, {row[f'{kind}_id'] for row in rows if f'{kind}_id' in row})
+    return rows
+
+
+# ==========================================
+# HTTP
+# ==========================================
+
+class Request:
+    def __init__(self, scope):
+        self.path = scope['path']
+        self.method = scope['method']
+        self.args = dict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        self._session = None
+
+    @property
+    def session(self):
+        """The Flask session, read from the signed session cookie"""
+        if self._session is None:
+            self._session = {}
+            cookies = SimpleCookie(self.headers.get('cookie', ''))
+            morsel = cookies.get(config['SESSION_COOKIE_NAME'])
+            serializer = flask_app.app.session_interface.get_signing_serializer(flask_app.app)
+            if morsel is not None and serializer is not None:
+                try:
+                    self._session = serializer.loads(
+                        morsel.value, max_age=int(flask_app.app.permanent_session_lifetime.total_seconds()))
+                except Exception:
+                    pass
+        return self._session
+
+    def not_modified(self, etag, last_modified=None):
+        """Whether If-None-Match / If-Modified-Since match, decided as Flask's make_conditional does"""
+        environ = {'REQUEST_METHOD': self.method}
+        for header in ('if-none-match', 'if-modified-since'):
+            if header in self.headers:
+                environ['HTTP_' + header.upper().replace('-', '_')] = self.headers[header]
+        return not is_resource_modified(environ, etag, last_modified=last_modified)
+
+
+def json_response(payload, status=200, etag=None, last_modified=None):
+    body = payload if isinstance(payload, bytes) else flask_app.app.json.dumps(payload).encode()
+    headers = [(b'content-type', b'application/json')]
+    if etag:
+        headers += [(b'etag', f'"{etag}"'.encode()), (b'cache-control', b'private, no-cache')]
+    if last_modified:
+        headers.append((b'last-modified', http_date(last_modified).encode()))
+    return status, headers, body
+
+
+def not_modified(etag):
+    return 304, [(b'etag', f'"{etag}"'.encode())], b''
+
+
+async def data_version():
+    rows = await db.fetchall(flask_app.ANALYTICS_STATE_SQL)
+    return rows[0]['version'] if rows else 0
+
+
+async def results_api(request):
+    """Keyset pages of /api/results; DataTables requests stay on the Flask app"""
+    if 'user_id' not in request.session:
+        return json_response({'error': 'Please login to view results'}, 401)
+    if 'draw' in request.args:
+        return json_response({'error': 'DataTables requests are served by the main app'}, 400)
+
+    length = int(request.args.get('length', config['RESULTS_PAGE_SIZE']))
+    length = min(max(length, 1), config['RESULTS_PAGE_MAX'])
+    key, etag = flask_app.snapshot_key('results', await data_version(),
+                                       dict(flask_app.cache_args(request.args), length=length))
+    if request.not_modified(etag):
+        return not_modified(etag)
+
+    body = flask_app.result_cache.get(key)
+    if body is None:
+        resolve = await resolve_filters({field: request.args.get(field, '')
+                                         for field in ('semester', 'subject', 'branch')})
+        filter_query, params = flask_app.build_results_filter(request.args, resolve=resolve)
+        query, params = flask_app.build_keyset_query(filter_query, params, length + 1, request.args.get('after'),
+                                                     await results_source(request.args, resolve))
+        rows = await preload_dimensions(await db.fetchall(query, params))
+        body = flask_app.app.json.dumps(flask_app.keyset_payload(rows, length)).encode()
+        flask_app.result_cache.set(key, body)
+    return json_response(body, etag=etag)
+
+
+async def analytics_api(request):
+    if request.session.get('role') != 'admin':
+        return json_response({'error': 'Admin access required'}, 403)
+
+    semester_filter = request.args.get('semester', '')
+    branch_filter = request.args.get('branch', '')
+    rows = await db.fetchall(flask_app.ANALYTICS_STATE_SQL)
+    etag, last_modified = flask_app.analytics_validators(rows[0] if rows else None, semester_filter, branch_filter)
+    if request.not_modified(etag, last_modified):
+        return not_modified(etag)
+
+    resolve = await resolve_filters({'semester': semester_filter, 'branch': branch_filter})
+    results = {}
+    for name, query, params in flask_app.analytics_queries(semester_filter, branch_filter, resolve=resolve):
+        results[name] = await preload_dimensions(await db.fetchall(query, params))
+    return json_response(flask_app.analytics_payload(results), etag=etag, last_modified=last_modified)
+
+
+ROUTES = {
+    '/api/results': results_api,
+    '/api/analytics': analytics_api,
+}
+
+
+async def app(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await db.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await db.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+
+    request = Request(scope)
+    handler = ROUTES.get(request.path)
+    if handler is None:
+        status, headers, body = json_response({'error': 'Not found'}, 404)
+    elif request.method not in ('GET', 'HEAD'):
+        status, headers, body = json_response({'error': 'Method not allowed'}, 405)
+    else:
+        try:
+            status, headers, body = await handler(request)
+        except Exception as e:
+            flask_app.metrics.error(f'async:{request.path}')
+            status, headers, body = json_response({'error': str(e)}, 500)
+
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': headers + [(b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body if request.method == 'GET' else b''})
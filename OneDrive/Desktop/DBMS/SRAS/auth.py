@@ -0,0 +1,152 @@
+"""
+Password hashing off the request thread, and login rate limiting.
+
+scrypt/pbkdf2 verification is deliberately CPU-bound, so PasswordHasher runs it in
+a bounded process pool: request threads wait on a future instead of holding the
+GIL, and once PASSWORD_HASH_QUEUE verifications are waiting further logins are
+refused rather than queued. RateLimiter keeps its counters in process memory, so
+each worker process enforces its own limits.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full or a verification timed out"""
+
+
+# ==========================================
+# PASSWORD HASHING
+# ==========================================
+
+def _hash_method(stored_hash):
+    return stored_hash.split('$', 1)[0]
+
+
+class PasswordHasher:
+    """
+    Flask extension hashing and verifying passwords in a process pool of
+    PASSWORD_HASH_WORKERS processes (0 hashes on the calling thread). At most
+    PASSWORD_HASH_QUEUE calls may wait for a worker; past that, and after
+    PASSWORD_HASH_TIMEOUT seconds, HasherBusy is raised. New hashes use
+    PASSWORD_HASH_METHOD, and needs_rehash() tells when a stored hash was made
+    with different parameters.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._slots = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', os.cpu_count() or 2)
+        app.config.setdefault('PASSWORD_HASH_QUEUE', 64)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10.0)
+        self.app = app
+        workers = app.config['PASSWORD_HASH_WORKERS']
+        self._slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_HASH_QUEUE'])
+        # werkzeug expands e.g. 'scrypt' to 'scrypt:32768:8:1'; compare stored hashes against that
+        self.method = _hash_method(generate_password_hash('', app.config['PASSWORD_HASH_METHOD']))
+        # Verified when the username does not exist, so unknown users cost as much as wrong passwords
+        self._dummy_hash = generate_password_hash(os.urandom(16).hex(), app.config['PASSWORD_HASH_METHOD'])
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.app.config['PASSWORD_HASH_WORKERS'])
+            return self._executor
+
+    def _call(self, func, *args):
+        if not self.app.config['PASSWORD_HASH_WORKERS']:
+            return func(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy('Too many logins in progress')
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.app.config['PASSWORD_HASH_TIMEOUT'])
+        except FutureTimeout:
+            raise HasherBusy('Password check timed out') from None
+
+    def hash(self, password):
+        return self._call(generate_password_hash, password, self.app.config['PASSWORD_HASH_METHOD'])
+
+    def verify(self, stored_hash, password):
+        """Check password against stored_hash; None (unknown user) checks a dummy hash and fails"""
+        matches = self._call(check_password_hash, stored_hash or self._dummy_hash, password)
+        return matches and stored_hash is not None
+
+    def needs_rehash(self, stored_hash):
+        return _hash_method(stored_hash) != self.method
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+
+# ==========================================
+# RATE LIMITING
+# ==========================================
+
+class RateLimiter:
+    """
+    Sliding-window limiter: at most `limit` hits per key within `window` seconds.
+    Counters live in this process; keys idle for a full window are dropped.
+    """
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._hits = {}
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+
+    def _prune(self, hits, now):
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+
+    def _sweep(self, now):
+        if now - self._last_sweep < self.window:
+            return
+        self._last_sweep = now
+        for key in [key for key, hits in self._hits.items() if not hits or hits[-1] <= now - self.window]:
+            del self._hits[key]
+
+    def retry_after(self, key):
+        """Seconds until key may be hit again, or 0 when it is under its limit"""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if not hits:
+                return 0
+            self._prune(hits, now)
+            if len(hits) < self.limit:
+                return 0
+            return max(hits[0] + self.window - now, 0)
+
+    def hit(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            hits = self._hits.setdefault(key, deque())
+            self._prune(hits, now)
+            hits.append(now)
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
@@ -0,0 +1,12 @@
+"""
+Benchmark and load-test suite for the Student Result Analysis System.
+
+    python -m benchmark.generate --rows 100000 --output cohort.csv
+    python -m benchmark.run --rows 100000 --output bench.json [--compare baseline.json]
+
+By default the app runs against a throwaway SQLite database, so no MySQL server
+is needed. With SRAS_DB_BACKEND=mysql the benchmarks run against a scratch database
+(--mysql-db, default student_result_bench) created with empty copies of the
+configured MySQL database's tables and dropped afterwards; the configured
+database itself is never written to.
+"""
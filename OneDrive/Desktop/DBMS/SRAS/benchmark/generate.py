@@ -0,0 +1,76 @@
+"""Synthetic cohort generator writing the upload format (Roll Number,Name,Branch,Semester,Subject,Marks)"""
+import argparse
+import csv
+
+import numpy as np
+
+BRANCHES = ['CSE', 'ECE', 'EEE', 'ME', 'CE', 'IT', 'CSE-AI', 'ECE-AI']
+FIRST_NAMES = ['Aarav', 'Ananya', 'Rohit', 'Meera', 'Vikram', 'Priya', 'Arjun', 'Sneha', 'Karthik', 'Divya',
+               'Rahul', 'Kavya', 'Siddharth', 'Lakshmi', 'Nikhil', 'Pooja', 'Aditya', 'Shreya', 'Varun', 'Isha']
+LAST_NAMES = ['Reddy', 'Sharma', 'Patel', 'Iyer', 'Rao', 'Nair', 'Gupta', 'Kumar', 'Singh', 'Menon',
+              'Das', 'Joshi', 'Verma', 'Pillai', 'Chopra', 'Bose', 'Naidu', 'Mehta', 'Kulkarni', 'Shetty']
+HEADER = ['Roll Number', 'Name', 'Branch', 'Semester', 'Subject', 'Marks']
+
+
+def iter_cohort(rows, semesters=8, subjects_per_semester=6, absent_rate=0.02, seed=42, chunk_students=10000):
+    """
+    Yield lists of CSV rows totalling exactly `rows`. Students are spread over the
+    branches, each takes subjects_per_semester subjects in every semester, and marks
+    follow a clipped normal distribution with a small share of absentees (-1).
+    """
+    rng = np.random.default_rng(seed)
+    per_student = semesters * subjects_per_semester
+    students = -(-rows // per_student)
+    subjects = [[f'Subject {sem}.{i}' for i in range(1, subjects_per_semester + 1)] for sem in range(1, semesters + 1)]
+
+    written = 0
+    for start in range(0, students, chunk_students):
+        batch = []
+        for student in range(start, min(start + chunk_students, students)):
+            branch = BRANCHES[student % len(BRANCHES)]
+            roll = f'{branch}{student + 1:07d}'
+            name = f'{FIRST_NAMES[student % len(FIRST_NAMES)]} {LAST_NAMES[(student // len(FIRST_NAMES)) % len(LAST_NAMES)]}'
+            ability = rng.normal(0, 8)
+            marks = np.clip(np.round(rng.normal(65 + ability, 12, per_student)), 0, 100)
+            marks[rng.random(per_student) < absent_rate] = -1
+            i = 0
+            for sem in range(semesters):
+                for subject in subjects[sem]:
+                    if written + len(batch) >= rows:
+                        break
+                    batch.append([roll, name, branch, f'Semester {sem + 1}', subject, int(marks[i])])
+                    i += 1
+        written += len(batch)
+        yield batch
+        if written >= rows:
+            return
+
+
+def write_cohort(path, rows, **options):
+    """Write a synthetic cohort CSV without holding it all in memory; returns the row count"""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for batch in iter_cohort(rows, **options):
+            writer.writerows(batch)
+            count += len(batch)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--output', default='cohort.csv')
+    parser.add_argument('--semesters', type=int, default=8)
+    parser.add_argument('--subjects', type=int, default=6, help='subjects per semester')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    count = write_cohort(args.output, args.rows, semesters=args.semesters,
+                         subjects_per_semester=args.subjects, seed=args.seed)
+    print(f'Wrote {count} rows to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
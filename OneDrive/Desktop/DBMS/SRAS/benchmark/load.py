@@ -0,0 +1,168 @@
+"""
+Load test the read endpoints: sync Flask workers versus the async tier.
+
+Both tiers get the same mix of /api/results and /api/analytics requests with
+--concurrency requests in flight. The sync tier is served by --workers threads
+(one request per worker, like gunicorn sync workers); the async tier by one event
+loop calling async_api.app directly. The result cache is off unless --cache is
+given, so every request reaches the database. --db-latency-ms adds a fixed wait
+to every statement on both tiers to model the network round trip to a MySQL
+server, which is where a blocked sync worker and an awaiting coroutine differ.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark.generate import write_cohort
+from benchmark.run import (ADMIN_PASSWORD, ADMIN_USER, SCRATCH_MYSQL_DB, create_scratch_mysql, drop_scratch_mysql,
+                           summarize)
+
+URLS = [
+    '/api/results?length=50',
+    '/api/results?semester=Semester+1&length=50',
+    '/api/results?semester=Semester+2&branch=CSE&length=50',
+    '/api/analytics',
+    '/api/analytics?semester=Semester+1',
+    '/api/analytics?branch=ECE',
+]
+
+
+def report(name, latencies, wall):
+    result = summarize(latencies)
+    result['requests_per_sec'] = round(len(latencies) / wall, 1)
+    print(f"{name:6} {result['requests_per_sec']:9.1f} req/s  p50 {result['p50_ms']:8.2f} ms  "
+          f"p95 {result['p95_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms")
+    return result
+
+
+def run_sync(app_module, cookie, requests, workers):
+    """Each request waits for one of `workers` threads; latency includes that wait"""
+    def one(url):
+        client = app_module.app.test_client()
+        client.set_cookie(app_module.app.config['SESSION_COOKIE_NAME'], cookie)
+        response = client.get(url)
+        assert response.status_code == 200, f'{url}: {response.status_code}'
+
+    def timed(url, submitted):
+        one(url)
+        return time.perf_counter() - submitted
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(timed, URLS[i % len(URLS)], time.perf_counter()) for i in range(requests)]
+        latencies = [future.result() for future in futures]
+    return latencies, time.perf_counter() - started
+
+
+async def run_async(async_api, cookie, requests, concurrency):
+    cookie_header = f"{async_api.config['SESSION_COOKIE_NAME']}={cookie}".encode()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(url):
+        path, _, query = url.partition('?')
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query.encode(),
+                 'headers': [(b'cookie', cookie_header)]}
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        submitted = time.perf_counter()
+        async with slots:
+            await async_api.app(scope, receive, send)
+        assert sent[0]['status'] == 200, f"{url}: {sent[0]['status']} {sent[1]['body'][:200]}"
+        return time.perf_counter() - submitted
+
+    await async_api.db.start()
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(one(URLS[i % len(URLS)]) for i in range(requests)))
+    wall = time.perf_counter() - started
+    await async_api.db.close()
+    return latencies, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000, help='synthetic cohort size')
+    parser.add_argument('--requests', type=int, default=2000, help='requests per tier')
+    parser.add_argument('--concurrency', type=int, default=100, help='requests in flight')
+    parser.add_argument('--workers', type=int, default=4, help='sync worker threads')
+    parser.add_argument('--db-latency-ms', type=float, default=0.0, help='simulated wait per SQL statement')
+    parser.add_argument('--cache', action='store_true', help='leave the result snapshot cache on')
+    parser.add_argument('--output', help='optional JSON file for the results')
+    parser.add_argument('--mysql-db', default=SCRATCH_MYSQL_DB,
+                        help=f'scratch database created (and dropped) with SRAS_DB_BACKEND=mysql '
+                             f'(default {SCRATCH_MYSQL_DB})')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='sras-bench-')
+    os.environ.setdefault('SRAS_DB_BACKEND', 'sqlite')
+    os.environ.setdefault('SRAS_SQLITE_PATH', os.path.join(workdir, 'bench.db'))
+
+    import app as app_module
+    from cache import MemoryCache
+    app = app_module.app
+    app.config.update(TESTING=True, BACKGROUND_JOBS=False, PASSWORD_HASH_WORKERS=0,
+                      UPLOAD_FOLDER=os.path.join(workdir, 'uploads'), SLOW_REQUEST_THRESHOLD=float('inf'),
+                      ASYNC_DB_POOL_SIZE=args.concurrency)
+    app_module.passwords.init_app(app)
+    if not args.cache:
+        app_module.result_cache = MemoryCache(max_entries=0)
+    import async_api
+
+    mysql = app.config['DB_BACKEND'] == 'mysql'
+    if mysql:
+        create_scratch_mysql(app_module, args.mysql_db)
+
+    try:
+        csv_path = os.path.join(workdir, 'cohort.csv')
+        write_cohort(csv_path, args.rows)
+        client = app.test_client()
+        client.post('/add_user', data={'username': ADMIN_USER, 'password': ADMIN_PASSWORD, 'role': 'admin'})
+        client.post('/login', data={'username': ADMIN_USER, 'password': ADMIN_PASSWORD})
+        with open(csv_path, 'rb') as f:
+            client.post('/upload_results', data={'grading_type': 'absolute', 'file': (f, 'cohort.csv')},
+                        content_type='multipart/form-data')
+        cookie = client.get_cookie(app.config['SESSION_COOKIE_NAME']).value
+
+        if args.db_latency_ms:
+            delay = args.db_latency_ms / 1000
+            import db as db_module
+            run_statement = db_module.Cursor._run
+            fetchall = async_api.AsyncDatabase.fetchall
+
+            def slow_run(self, *a, **kw):
+                time.sleep(delay)
+                return run_statement(self, *a, **kw)
+
+            async def slow_fetchall(self, *a, **kw):
+                await asyncio.sleep(delay)
+                return await fetchall(self, *a, **kw)
+            db_module.Cursor._run = slow_run
+            async_api.AsyncDatabase.fetchall = slow_fetchall
+
+        print(f'{args.requests} requests, {args.concurrency} in flight, {args.workers} sync workers, '
+              f'{args.db_latency_ms:g} ms simulated latency per statement, cache {"on" if args.cache else "off"}')
+        results = {
+            'sync': report('sync', *run_sync(app_module, cookie, args.requests, args.workers)),
+            'async': report('async', *asyncio.run(run_async(async_api, cookie, args.requests, args.concurrency))),
+        }
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump({'args': vars(args), 'results': results}, f, indent=2)
+    finally:
+        if mysql:
+            drop_scratch_mysql(app_module)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
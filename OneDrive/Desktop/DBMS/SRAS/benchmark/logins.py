@@ -0,0 +1,93 @@
+"""
+Measure logins/sec under concurrency, hashing on the request thread versus in the process pool.
+
+Each client thread posts /login through its own Flask test client for a fixed
+number of logins; rate limits are lifted so only hashing is measured.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from benchmark.run import ADMIN_PASSWORD, ADMIN_USER, summarize
+
+
+def run_logins(app_module, threads, logins):
+    """Run threads x logins successful logins; returns (latencies, wall seconds)"""
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads + 1)
+
+    def client_thread():
+        client = app_module.app.test_client()
+        mine = []
+        barrier.wait()
+        for _ in range(logins):
+            started = time.perf_counter()
+            response = client.post('/login', data={'username': ADMIN_USER, 'password': ADMIN_PASSWORD})
+            mine.append(time.perf_counter() - started)
+            assert response.status_code == 302, f'login failed with {response.status_code}'
+        with lock:
+            latencies.extend(mine)
+
+    workers = [threading.Thread(target=client_thread) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--logins', type=int, default=10, help='logins per client')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='hashing processes for the pool run')
+    parser.add_argument('--output', help='optional JSON file for the results')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='sras-bench-')
+    os.environ.setdefault('SRAS_DB_BACKEND', 'sqlite')
+    os.environ.setdefault('SRAS_SQLITE_PATH', os.path.join(workdir, 'bench.db'))
+
+    import app as app_module
+    app = app_module.app
+    app.config['TESTING'] = True
+    app.config['SLOW_REQUEST_THRESHOLD'] = float('inf')
+    for limiter in (app_module.user_login_limiter, app_module.ip_login_limiter):
+        limiter.limit = sys.maxsize
+    app.test_client().post('/add_user', data={'username': ADMIN_USER, 'password': ADMIN_PASSWORD, 'role': 'admin'})
+
+    results = {}
+    for name, workers in (('inline', 0), ('process_pool', args.workers)):
+        app_module.passwords.shutdown()
+        app.config['PASSWORD_HASH_WORKERS'] = workers
+        app.config['PASSWORD_HASH_QUEUE'] = args.threads
+        app_module.passwords.init_app(app)
+        run_logins(app_module, 1, 1)  # start the pool outside the timed run
+
+        latencies, wall = run_logins(app_module, args.threads, args.logins)
+        result = summarize(latencies)
+        result['logins_per_sec'] = round(len(latencies) / wall, 1)
+        results[name] = result
+        print(f"{name:14} {result['logins_per_sec']:8.1f} logins/sec  "
+              f"p50 {result['p50_ms']:8.1f} ms  p95 {result['p95_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms")
+    app_module.passwords.shutdown()
+
+    speedup = results['process_pool']['logins_per_sec'] / max(results['inline']['logins_per_sec'], 1e-9)
+    print(f'{args.threads} clients, {args.workers} hashing processes: {speedup:.2f}x logins/sec '
+          f'(method {app_module.passwords.method}, {os.cpu_count()} CPUs)')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'threads': args.threads, 'logins': args.logins, 'workers': args.workers,
+                       'method': app_module.passwords.method, 'results': results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+Time the app's heavy paths through the Flask test client and record a JSON baseline.
+
+Scenarios: upload_results (absolute, relative, an unchanged re-upload and a re-upload
+that drops one student with delete_missing),
+apply_relative_grading (one subject and a whole semester), /results, /dashboard,
+/api/results and /api/analytics. Each result records latency percentiles, rows/sec where it
+applies, and the process's peak RSS.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmark.generate import write_cohort
+
+ADMIN_USER = 'bench_admin'
+ADMIN_PASSWORD = 'bench-password'
+TABLES = ['students', 'student_semester_summary', 'analytics_rollup', 'mark_sketch', 'app_state', 'jobs', 'users']
+SCRATCH_MYSQL_DB = 'student_result_bench'
+
+
+def create_scratch_mysql(app_module, name):
+    """
+    Point the app at a new MySQL database holding empty copies of the tables of the
+    configured MYSQL_DB, so benchmarks never write to the real data. Fails if name
+    already exists; drop_scratch_mysql removes it afterwards.
+    """
+    config = app_module.app.config
+    source = config['MYSQL_DB']
+    if name == source:
+        raise SystemExit(f'--mysql-db must not be the app database ({source})')
+    import MySQLdb
+    conn = MySQLdb.connect(host=config['MYSQL_HOST'], user=config['MYSQL_USER'], passwd=config['MYSQL_PASSWORD'],
+                           port=config.get('MYSQL_PORT', 3306), charset='utf8mb4')
+    try:
+        cur = conn.cursor()
+        cur.execute(f"CREATE DATABASE `{name}`")
+        cur.execute("""
+            SELECT TABLE_NAME FROM information_schema.TABLES 
+            WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE'
+        """, (source,))
+        for (table,) in cur.fetchall():
+            cur.execute(f"CREATE TABLE `{name}`.`{table}` LIKE `{source}`.`{table}`")
+    finally:
+        conn.close()
+    # The pool connects on first use, so this takes effect as long as nothing has queried yet
+    config['MYSQL_DB'] = name
+
+
+def drop_scratch_mysql(app_module):
+    import MySQLdb
+
+    config = app_module.app.config
+    conn = MySQLdb.connect(host=config['MYSQL_HOST'], user=config['MYSQL_USER'], passwd=config['MYSQL_PASSWORD'],
+                           port=config.get('MYSQL_PORT', 3306), charset='utf8mb4')
+    try:
+        conn.cursor().execute(f"DROP DATABASE IF EXISTS `{config['MYSQL_DB']}`")
+    finally:
+        conn.close()
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def summarize(latencies, rows=None):
+    samples = np.array(latencies) * 1000
+    result = {
+        'count': len(latencies),
+        'mean_ms': round(float(samples.mean()), 3),
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p95_ms': round(float(np.percentile(samples, 95)), 3),
+        'p99_ms': round(float(np.percentile(samples, 99)), 3),
+        'max_ms': round(float(samples.max()), 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+    if rows is not None:
+        result['rows_per_sec'] = round(rows / (sum(latencies) / len(latencies)), 1)
+    return result
+
+
+class Bench:
+    def __init__(self, app_module, csv_path, rows, requests):
+        self.app_module = app_module
+        self.app = app_module.app
+        self.csv_path = csv_path
+        self.rows = rows
+        self.requests = requests
+        self.client = self.app.test_client()
+        self.results = {}
+
+    def reset(self):
+        """Empty every table and the in-process caches, then log the admin back in"""
+        with self.app.app_context():
+            cur = self.app_module.db.connection.cursor()
+            for table in TABLES:
+                cur.execute(f'DELETE FROM {table}')
+            self.app_module.db.connection.commit()
+            cur.close()
+        self.app_module.invalidate_stats_cache()
+        self.client = self.app.test_client()
+        self.client.post('/add_user', data={'username': ADMIN_USER, 'password': ADMIN_PASSWORD, 'role': 'admin'})
+        response = self.client.post('/login', data={'username': ADMIN_USER, 'password': ADMIN_PASSWORD})
+        assert response.status_code == 302 and 'dashboard' in response.location, 'benchmark admin login failed'
+
+    def flashes(self):
+        """Pop the (category, message) flashes the last request left in the session"""
+        with self.client.session_transaction() as session:
+            return session.pop('_flashes', [])
+
+    def timed(self, func, status=200, location=None, check=None):
+        """
+        Time one request and verify it did what the scenario expects: the status code,
+        the redirect target, no error flash, and check(response, flashes) if given
+        """
+        started = time.perf_counter()
+        response = func()
+        elapsed = time.perf_counter() - started
+        body = response.get_data(as_text=True)[:200]
+        assert response.status_code == status, f'expected {status}, got {response.status_code}: {body}'
+        if location is not None:
+            assert response.location.split('?')[0].endswith(location), f'redirected to {response.location}'
+        flashes = self.flashes()
+        errors = [message for category, message in flashes if category == 'error']
+        assert not errors, f'error flashed: {errors}'
+        if check is not None:
+            check(response, flashes)
+        return elapsed
+
+    def check_upload(self, response, flashes):
+        if not self.app.config['BACKGROUND_JOBS']:
+            assert any(message.startswith('Upload complete!') for _, message in flashes), f'upload failed: {flashes}'
+
+    def check_regrade(self, response, flashes):
+        if not self.app.config['BACKGROUND_JOBS']:
+            updated = [int(n) for _, message in flashes for n in re.findall(r'(\d+) records updated', message)]
+            assert updated and updated[0] > 0, f'nothing re-graded: {flashes}'
+
+    def post_upload(self, grading_type, mode='upsert', csv_path=None, delete_missing=False):
+        csv_path = csv_path or self.csv_path
+        data = {'grading_type': grading_type, 'mode': mode}
+        if delete_missing:
+            data['delete_missing'] = 'on'
+        with open(csv_path, 'rb') as f:
+            data['file'] = (f, os.path.basename(csv_path))
+            return self.timed(lambda: self.client.post('/upload_results', data=data, content_type='multipart/form-data'),
+                              302, '/dashboard', self.check_upload)
+
+    def upload(self, grading_type):
+        self.reset()
+        self.results[f'upload_{grading_type}'] = summarize([self.post_upload(grading_type)], self.rows)
+
+    def reupload(self):
+        """Upload the same sheet again: every row is unchanged, so nothing is written"""
+        self.results['upload_unchanged'] = summarize([self.post_upload('absolute')], self.rows)
+
+    def prune(self):
+        """
+        Re-upload the sheet without one student and delete_missing: only that student's
+        rows are deleted, and their semester summaries must go with them
+        """
+        sheet = pd.read_csv(self.csv_path, dtype=object)
+        dropped = sheet['Roll Number'].iloc[0]
+        pruned_path = self.csv_path.replace('.csv', '_pruned.csv')
+        sheet[sheet['Roll Number'] != dropped].to_csv(pruned_path, index=False)
+        self.results['upload_delete_missing'] = summarize(
+            [self.post_upload('absolute', csv_path=pruned_path, delete_missing=True)], self.rows)
+
+        if not self.app.config['BACKGROUND_JOBS']:
+            response = self.client.get(f'/api/students/{dropped}/transcript')
+            assert response.status_code == 404, f'summary of deleted student {dropped} left behind: {response.get_json()}'
+            with self.app.app_context():
+                cur = self.app_module.db.connection.cursor()
+                cur.execute("""
+                    SELECT COUNT(*) FROM student_semester_summary s
+                    WHERE class_size != (SELECT COUNT(*) FROM student_semester_summary c
+                                         WHERE c.semester_id = s.semester_id AND c.branch_id = s.branch_id)
+                """)
+                stale = cur.fetchone()[0]
+                cur.close()
+            assert stale == 0, f'{stale} summaries kept a class_size counting the deleted student'
+
+    def regrade(self):
+        semester, subject = 'Semester 1', 'Subject 1.1'
+        elapsed = self.timed(lambda: self.client.post(
+            '/apply_relative_grading', data={'semester': semester, 'subject': subject}),
+            302, '/dashboard', self.check_regrade)
+        self.results['apply_relative_grading_subject'] = summarize([elapsed])
+        elapsed = self.timed(lambda: self.client.post(
+            '/apply_relative_grading', data={'semester': semester, 'all_subjects': 'on'}),
+            302, '/dashboard', self.check_regrade)
+        self.results['apply_relative_grading_semester'] = summarize([elapsed])
+
+    def reads(self):
+        pages = {
+            'results_page': '/results',
+            'results_page_filtered': '/results?semester=Semester+1&branch=CSE',
+            'dashboard': '/dashboard',
+            'dashboard_filtered': '/dashboard?semester=Semester+1&branch=CSE',
+            'api_results_first_page': '/api/results?length=50',
+            'api_results_datatables_deep_page': (
+                f'/api/results?draw=1&start={max(self.rows - 100, 0)}&length=50'
+                '&order[0][column]=0&order[0][dir]=asc&columns[0][data]=roll_number'),
+            'api_results_filtered': '/api/results?semester=Semester+1&branch=CSE&length=50',
+            'api_analytics': '/api/analytics',
+            'api_analytics_filtered': '/api/analytics?semester=Semester+1&branch=CSE',
+        }
+        # Non-empty payload each JSON endpoint must return
+        payload_keys = {'api_results_first_page': 'data', 'api_results_datatables_deep_page': 'data',
+                        'api_results_filtered': 'data', 'api_analytics': 'grade_distribution',
+                        'api_analytics_filtered': 'grade_distribution'}
+
+        def check_payload(name):
+            def check(response, flashes):
+                if name in payload_keys:
+                    assert response.get_json().get(payload_keys[name]), f'{name}: empty {payload_keys[name]}'
+            return check
+
+        for name, url in pages.items():
+            latencies = [self.timed(lambda: self.client.get(url), check=check_payload(name))
+                         for _ in range(self.requests)]
+            self.results[name] = summarize(latencies)
+
+    def run(self):
+        self.upload('absolute')
+        self.reupload()
+        self.prune()
+        self.upload('relative')
+        self.regrade()
+        self.reads()
+        return self.results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline, tolerance):
+    """Print per-scenario changes against a baseline; returns the names that regressed"""
+    regressions = []
+    print(f"\n{'scenario':40} {'p50 base':>10} {'p50 now':>10} {'change':>8}")
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            print(f'{name:40} {"-":>10} {result["p50_ms"]:>10.2f}      new')
+            continue
+        change = (result['p50_ms'] - base['p50_ms']) / base['p50_ms'] if base['p50_ms'] else 0
+        flag = ' !' if change > tolerance else ''
+        print(f"{name:40} {base['p50_ms']:>10.2f} {result['p50_ms']:>10.2f} {change:>+7.0%}{flag}")
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000, help='synthetic cohort size (10k to 10M)')
+    parser.add_argument('--requests', type=int, default=30, help='requests per read scenario')
+    parser.add_argument('--output', default='bench.json', help='where to write the JSON results')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed p50 slowdown before a scenario counts as a regression (default 0.2 = 20%%)')
+    parser.add_argument('--background-jobs', action='store_true',
+                        help='leave BACKGROUND_JOBS on (uploads then only time the enqueue)')
+    parser.add_argument('--mysql-db', default=SCRATCH_MYSQL_DB,
+                        help=f'scratch database created (and dropped) with SRAS_DB_BACKEND=mysql '
+                             f'(default {SCRATCH_MYSQL_DB})')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='sras-bench-')
+    os.environ.setdefault('SRAS_DB_BACKEND', 'sqlite')
+    os.environ.setdefault('SRAS_SQLITE_PATH', os.path.join(workdir, 'bench.db'))
+
+    import app as app_module
+    app_module.app.config['TESTING'] = True
+    app_module.app.config['BACKGROUND_JOBS'] = args.background_jobs
+    app_module.app.config['UPLOAD_FOLDER'] = os.path.join(workdir, 'uploads')
+    mysql = app_module.app.config['DB_BACKEND'] == 'mysql'
+    if mysql:
+        create_scratch_mysql(app_module, args.mysql_db)
+
+    csv_path = os.path.join(workdir, 'cohort.csv')
+    print(f'Generating {args.rows} rows ...')
+    write_cohort(csv_path, args.rows)
+
+    print(f"Running scenarios on {app_module.app.config['DB_BACKEND']} ...")
+    try:
+        results = Bench(app_module, csv_path, args.rows, args.requests).run()
+    finally:
+        if mysql:
+            drop_scratch_mysql(app_module)
+    report = {
+        'meta': {
+            'rows': args.rows,
+            'requests': args.requests,
+            'backend': app_module.app.config['DB_BACKEND'],
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+        },
+        'results': results,
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    for name, result in results.items():
+        extra = f", {result['rows_per_sec']:.0f} rows/sec" if 'rows_per_sec' in result else ''
+        print(f"{name:40} p50 {result['p50_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms{extra}")
+    print(f"Peak RSS {report['meta']['peak_rss_mb']} MB; results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegressed: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Snapshot cache for rendered result payloads.
+
+Keys carry the data version that every write to students bumps, so entries are
+never invalidated one by one: a write makes every older key unreachable and the
+stale entries age out through LRU eviction or their TTL. MemoryCache is per
+process; RedisCache (any Redis-compatible server) is shared by all workers and
+needs the optional `redis` package.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class MemoryCache:
+    """Thread-safe LRU of at most max_entries values, each kept for ttl seconds"""
+    name = 'memory'
+
+    def __init__(self, max_entries=10000, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry[0] >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisCache:
+    """Values stored under prefix + key with a ttl-second expiry; lookups that fail count as misses"""
+    name = 'redis'
+
+    def __init__(self, url, ttl=600, prefix='sras:results:'):
+        import redis
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5)
+        self._errors = (redis.RedisError,)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        try:
+            return self._client.get(self.prefix + key)
+        except self._errors:
+            return None
+
+    def set(self, key, value):
+        try:
+            self._client.set(self.prefix + key, value, ex=max(int(self.ttl), 1))
+        except self._errors:
+            pass
+
+    def clear(self):
+        # Keys of older data versions are unreachable already; this only frees memory early
+        try:
+            for key in self._client.scan_iter(match=self.prefix + '*', count=1000):
+                self._client.delete(key)
+        except self._errors:
+            pass
+
+
+def create_cache(config):
+    """MemoryCache, or RedisCache when RESULT_CACHE_URL is set"""
+    if config.get('RESULT_CACHE_URL'):
+        return RedisCache(config['RESULT_CACHE_URL'], config['RESULT_CACHE_TTL'])
+    return MemoryCache(config['RESULT_CACHE_MAX_ENTRIES'], config['RESULT_CACHE_TTL'])
@@ -0,0 +1,194 @@
+"""
+Query-plan regression check for the students table.
+
+Copies the students/students_archive/users/dimension table definitions (with their indexes) from
+the app's database into a scratch database, seeds it with synthetic rows, runs EXPLAIN for
+every hot query the app issues and exits non-zero if any of them regresses to a
+full table scan or a filesort.
+
+Usage: python check_query_plans.py [--rows 50000] [--keep]
+"""
+import argparse
+import random
+import sys
+
+import MySQLdb
+import MySQLdb.cursors
+
+from app import (app, build_keyset_query, encode_cursor, ARCHIVE_COLUMNS, DIMENSION_TABLES, INSERT_STUDENT_SQL,
+                 KEYSET_ORDER, RESULT_SELECT)
+
+SCRATCH_DB = 'student_result_plan_check'
+
+SEMESTERS = [f'Semester {i}' for i in range(1, 9)]
+BRANCHES = ['CSE', 'ECE', 'ME', 'CE', 'EEE', 'IT']
+SUBJECTS = [f'Subject {i}' for i in range(1, 41)]
+
+# Dimension ids are assigned in list order when seeding, starting at 1
+SEMESTER, BRANCH, SUBJECT = SEMESTERS.index('Semester 3') + 1, BRANCHES.index('CSE') + 1, SUBJECTS.index('Subject 7') + 1
+# Moved into students_archive after seeding
+ARCHIVED_SEMESTER = SEMESTERS.index('Semester 1') + 1
+
+def build_results_filter(filters):
+    """app.build_results_filter for filters already given as dimension ids"""
+    filter_query = "WHERE 1=1"
+    params = []
+    for field in ('semester', 'subject', 'branch'):
+        if field in filters:
+            filter_query += f" AND {field}_id = %s"
+            params.append(filters[field])
+    return filter_query, params
+
+def results_page(filters, after=None, source='students'):
+    filter_query, params = build_results_filter(filters)
+    return build_keyset_query(filter_query, params, 51, after, source)
+
+def hot_queries():
+    """(name, sql, params) for every query on the app's hot paths"""
+    cursor_row = {'semester_id': SEMESTER, 'branch_id': BRANCH, 'roll_number': 'CSE0100', 'subject_id': SUBJECT, 'id': 1000}
+    after = encode_cursor(cursor_row)
+
+    queries = [
+        ('relative_grading_cohort',
+         "SELECT id, marks FROM students WHERE semester_id = %s AND subject_id = %s AND marks >= 0",
+         [SEMESTER, SUBJECT]),
+        ('relative_grading_semester',
+         "SELECT id, subject_id, marks FROM students WHERE semester_id = %s AND marks >= 0",
+         [SEMESTER]),
+        ('relative_grading_new_student',
+         "SELECT marks FROM students WHERE semester_id = %s AND subject_id = %s AND marks >= 0",
+         [SEMESTER, SUBJECT]),
+        ('login_user',
+         "SELECT * FROM users WHERE username=%s",
+         ['admin']),
+    ]
+
+    for label, filters in [('semester', {'semester': SEMESTER}),
+                           ('semester_branch', {'semester': SEMESTER, 'branch': BRANCH})]:
+        filter_query, params = build_results_filter(filters)
+        queries.append((f'dashboard_totals_{label}', f"""
+            SELECT COUNT(DISTINCT roll_number), COUNT(DISTINCT subject_id), COUNT(DISTINCT semester_id)
+            FROM students {filter_query}
+        """, params))
+        queries.append((f'results_count_{label}', f"SELECT COUNT(*) FROM students {filter_query}", params))
+
+    for label, filters in [('all', {}),
+                           ('semester', {'semester': SEMESTER}),
+                           ('branch', {'branch': BRANCH}),
+                           ('subject', {'subject': SUBJECT}),
+                           ('semester_branch', {'semester': SEMESTER, 'branch': BRANCH}),
+                           ('semester_subject', {'semester': SEMESTER, 'subject': SUBJECT}),
+                           ('semester_subject_branch', {'semester': SEMESTER, 'subject': SUBJECT, 'branch': BRANCH})]:
+        sql, params = results_page(filters)
+        queries.append((f'results_page_{label}', sql, params))
+        sql, params = results_page(filters, after)
+        queries.append((f'results_page_{label}_after', sql, params))
+
+    # Inner id query of the DataTables deferred join in its default order
+    filter_query, params = build_results_filter({'semester': SEMESTER})
+    queries.append(('results_datatables_ids', f"""
+        SELECT f.id FROM (SELECT id, {', '.join(RESULT_SELECT)} FROM students {filter_query}) f
+        ORDER BY {', '.join(f'f.{field} ASC' for field in KEYSET_ORDER)}
+        LIMIT %s OFFSET %s
+    """, params + [25, 500]))
+
+    # Views filtered to an archived semester read students_archive
+    for label, filters in [('semester', {'semester': ARCHIVED_SEMESTER}),
+                           ('semester_branch', {'semester': ARCHIVED_SEMESTER, 'branch': BRANCH})]:
+        filter_query, params = build_results_filter(filters)
+        queries.append((f'archive_results_count_{label}', f"SELECT COUNT(*) FROM students_archive {filter_query}",
+                        params))
+        sql, params = results_page(filters, source='students_archive')
+        queries.append((f'archive_results_page_{label}', sql, params))
+        sql, params = results_page(filters, after, source='students_archive')
+        queries.append((f'archive_results_page_{label}_after', sql, params))
+
+    # Transcripts read both tables once a semester is archived
+    queries.append(('transcript_history', " UNION ALL ".join(f"""
+        SELECT semester_id, subject_id, marks, grade, grade_point FROM {table} WHERE roll_number = %s
+    """ for table in ('students', 'students_archive')), ['CSE0100'] * 2))
+    return queries
+
+def seed(cur, rows):
+    """Insert synthetic results: every student takes a handful of subjects in each semester"""
+    for kind, names in [('semester', SEMESTERS), ('subject', SUBJECTS), ('branch', BRANCHES)]:
+        cur.executemany(f"INSERT INTO {DIMENSION_TABLES[kind]} (id, name) VALUES (%s, %s)",
+                        list(enumerate(names, 1)))
+
+    random.seed(42)
+    batch = []
+    roll = 0
+    while len(batch) < rows:
+        roll += 1
+        branch = BRANCHES[roll % len(BRANCHES)]
+        roll_number = f'{branch}{roll:04d}'
+        for semester in SEMESTERS:
+            for subject in random.sample(SUBJECTS, 5):
+                marks = random.choice([-1] + [random.randint(0, 100)] * 20)
+                batch.append((roll_number, f'Student {roll}', SEMESTERS.index(semester) + 1,
+                              SUBJECTS.index(subject) + 1, marks, 'B', 8, BRANCHES.index(branch) + 1, None))
+    for start in range(0, rows, 5000):
+        cur.executemany(INSERT_STUDENT_SQL, batch[start:min(start + 5000, rows)])
+
+    # Archive one semester the way app.archive_semester does
+    columns = ', '.join(ARCHIVE_COLUMNS)
+    cur.execute(f"INSERT INTO students_archive ({columns}) SELECT {columns} FROM students WHERE semester_id = %s",
+                [ARCHIVED_SEMESTER])
+    cur.execute("DELETE FROM students WHERE semester_id = %s", [ARCHIVED_SEMESTER])
+    cur.execute(f"UPDATE {DIMENSION_TABLES['semester']} SET archived_at = NOW() WHERE id = %s", [ARCHIVED_SEMESTER])
+
+def check_plan(cur, name, sql, params):
+    """Return a list of problems found in the EXPLAIN output of one query"""
+    cur.execute('EXPLAIN ' + sql, params)
+    problems = []
+    for step in cur.fetchall():
+        if step.get('table') not in ('students', 'students_archive', 'users'):
+            continue
+        extra = step.get('Extra') or ''
+        if step.get('type') == 'ALL':
+            problems.append(f"full table scan on {step['table']}")
+        if 'Using filesort' in extra:
+            problems.append(f"filesort on {step['table']}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000, help='synthetic rows to seed (default 50000)')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch database afterwards')
+    args = parser.parse_args()
+
+    source_db = app.config['MYSQL_DB']
+    conn = MySQLdb.connect(host=app.config['MYSQL_HOST'], user=app.config['MYSQL_USER'],
+                           passwd=app.config['MYSQL_PASSWORD'], charset='utf8mb4',
+                           cursorclass=MySQLdb.cursors.DictCursor)
+    cur = conn.cursor()
+    failures = 0
+    try:
+        cur.execute(f"DROP DATABASE IF EXISTS {SCRATCH_DB}")
+        cur.execute(f"CREATE DATABASE {SCRATCH_DB}")
+        for table in ['students', 'students_archive', 'users'] + list(DIMENSION_TABLES.values()):
+            cur.execute(f"CREATE TABLE {SCRATCH_DB}.{table} LIKE {source_db}.{table}")
+        cur.execute(f"USE {SCRATCH_DB}")
+
+        print(f"Seeding {args.rows} rows into {SCRATCH_DB}.students ...")
+        seed(cur, args.rows)
+        conn.commit()
+        cur.execute("ANALYZE TABLE students, students_archive, users")
+        cur.fetchall()
+
+        for name, sql, params in hot_queries():
+            problems = check_plan(cur, name, sql, params)
+            status = 'FAIL' if problems else 'ok'
+            print(f"{status:4}  {name}{': ' + ', '.join(problems) if problems else ''}")
+            failures += bool(problems)
+    finally:
+        if not args.keep:
+            cur.execute(f"DROP DATABASE IF EXISTS {SCRATCH_DB}")
+        cur.close()
+        conn.close()
+
+    print(f"\n{failures} hot queries regressed" if failures else "\nAll hot queries use indexes")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -12,24 +12,146 @@ CREATE TABLE IF NOT EXISTS users (
     INDEX idx_username (username)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
--- Students Table (with branch column)
+-- Dimension tables: students and the derived tables store these small integer ids
+-- instead of repeating the names (see migrations/004_dimension_tables.sql)
+CREATE TABLE IF NOT EXISTS semesters (
+    id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(20) NOT NULL UNIQUE,
+    -- Set once the semester's results were moved to students_archive (flask archive-term)
+    archived_at TIMESTAMP NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS subjects (
+    id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS branches (
+    id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(50) NOT NULL UNIQUE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Students Table (semester, subject and branch reference the dimension tables)
+-- Results of open semesters, one hash partition per semester id (see migrations/007_term_partitions.sql).
+-- Partitioned InnoDB tables take no foreign keys, and every unique key must include semester_id.
 CREATE TABLE IF NOT EXISTS students (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id INT AUTO_INCREMENT,
     roll_number VARCHAR(50) NOT NULL,
     name VARCHAR(100) NOT NULL,
-    semester VARCHAR(20) NOT NULL,
-    subject VARCHAR(100) NOT NULL,
+    semester_id SMALLINT UNSIGNED NOT NULL,
+    subject_id SMALLINT UNSIGNED NOT NULL,
     marks DECIMAL(5,2) NOT NULL,
-    branch VARCHAR(50) NOT NULL DEFAULT 'General',
+    branch_id SMALLINT UNSIGNED NOT NULL,
     grade VARCHAR(10) NOT NULL,
     grade_point DECIMAL(3,2) NOT NULL,
+    -- Hash of the uploaded sheet values, used by upsert ingest to skip unchanged rows
+    row_hash CHAR(16) NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    INDEX idx_roll (roll_number),
-    INDEX idx_semester (semester),
-    INDEX idx_subject (subject),
+    PRIMARY KEY (id, semester_id),
+    -- Natural key of a result; also serves roll_number lookups (see migrations/005_upsert_key.sql)
+    UNIQUE KEY uq_roll_sem_subject (roll_number, semester_id, subject_id),
     INDEX idx_grade (grade),
-    INDEX idx_branch (branch)
+    -- Composite indexes for the hot access paths (see migrations/001_composite_indexes.sql)
+    INDEX idx_sem_branch_roll_subject (semester_id, branch_id, roll_number, subject_id),
+    INDEX idx_branch_sem_roll_subject (branch_id, semester_id, roll_number, subject_id),
+    INDEX idx_subject_sem_branch_roll (subject_id, semester_id, branch_id, roll_number),
+    INDEX idx_sem_subject_marks (semester_id, subject_id, marks)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+PARTITION BY HASH (semester_id) PARTITIONS 16;
+
+-- Results of closed semesters, moved out of students as a whole semester at a time
+CREATE TABLE IF NOT EXISTS students_archive (
+    id INT NOT NULL PRIMARY KEY,
+    roll_number VARCHAR(50) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    semester_id SMALLINT UNSIGNED NOT NULL,
+    subject_id SMALLINT UNSIGNED NOT NULL,
+    marks DECIMAL(5,2) NOT NULL,
+    branch_id SMALLINT UNSIGNED NOT NULL,
+    grade VARCHAR(10) NOT NULL,
+    grade_point DECIMAL(3,2) NOT NULL,
+    row_hash CHAR(16) NULL,
+    created_at TIMESTAMP NULL,
+    updated_at TIMESTAMP NULL,
+    UNIQUE KEY uq_roll_sem_subject (roll_number, semester_id, subject_id),
+    INDEX idx_sem_branch_roll_subject (semester_id, branch_id, roll_number, subject_id),
+    INDEX idx_branch_sem_roll_subject (branch_id, semester_id, roll_number, subject_id),
+    INDEX idx_subject_sem_branch_roll (subject_id, semester_id, branch_id, roll_number)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+-- Every result, open or archived; read when a query spans semesters and some are archived
+CREATE OR REPLACE VIEW students_history AS
+SELECT id, roll_number, name, semester_id, subject_id, marks, branch_id, grade, grade_point, row_hash, created_at, updated_at
+FROM students
+UNION ALL
+SELECT id, roll_number, name, semester_id, subject_id, marks, branch_id, grade, grade_point, row_hash, created_at, updated_at
+FROM students_archive;
+
+-- Per-student semester summary (SGPA and class rank), maintained by the app on every write
+CREATE TABLE IF NOT EXISTS student_semester_summary (
+    roll_number VARCHAR(50) NOT NULL,
+    semester_id SMALLINT UNSIGNED NOT NULL,
+    branch_id SMALLINT UNSIGNED NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    subjects INT NOT NULL DEFAULT 0,
+    credits INT NOT NULL DEFAULT 0,
+    grade_points DECIMAL(8,2) NOT NULL DEFAULT 0,
+    sgpa DECIMAL(4,2) NOT NULL DEFAULT 0,
+    class_rank INT NULL,
+    class_size INT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (roll_number, semester_id),
+    INDEX idx_sem_branch_sgpa (semester_id, branch_id, sgpa)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Pre-aggregated analytics (counts and mark sums per semester/branch/subject/grade), maintained on every write
+CREATE TABLE IF NOT EXISTS analytics_rollup (
+    semester_id SMALLINT UNSIGNED NOT NULL,
+    branch_id SMALLINT UNSIGNED NOT NULL,
+    subject_id SMALLINT UNSIGNED NOT NULL,
+    grade VARCHAR(10) NOT NULL,
+    row_count INT NOT NULL DEFAULT 0,
+    marks_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+    marks_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (semester_id, branch_id, subject_id, grade),
+    INDEX idx_branch (branch_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Mergeable mark sketch per cohort: valid marks counted per half-mark bucket (FLOOR(marks * 2))
+CREATE TABLE IF NOT EXISTS mark_sketch (
+    semester_id SMALLINT UNSIGNED NOT NULL,
+    branch_id SMALLINT UNSIGNED NOT NULL,
+    subject_id SMALLINT UNSIGNED NOT NULL,
+    bucket SMALLINT UNSIGNED NOT NULL,
+    row_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (semester_id, branch_id, subject_id, bucket),
+    INDEX idx_branch (branch_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Version counters for derived data (used for HTTP ETags)
+CREATE TABLE IF NOT EXISTS app_state (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Background Jobs Table (uploads and re-grading)
+CREATE TABLE IF NOT EXISTS jobs (
+    id CHAR(32) PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL,
+    status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+    processed INT NOT NULL DEFAULT 0,
+    total INT NULL,
+    rows_per_sec DOUBLE NOT NULL DEFAULT 0,
+    error_count INT NOT NULL DEFAULT 0,
+    errors MEDIUMTEXT NULL,
+    message TEXT NULL,
+    created_by VARCHAR(100) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME NULL,
+    finished_at DATETIME NULL,
+    INDEX idx_status (status)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- Insert default admin user (password: admin123)
@@ -37,8 +159,12 @@ INSERT INTO users (username, password, role) VALUES
 ('admin', 'scrypt:32768:8:1$KvZ8YGxLzMqJYqBP$c3d4c8c7e8b5d6f7a8b9c0d1e2f3a4b5c6d7e8f9a0b1c2d3e4f5a6b7c8d9e0f1a2b3c4d5e6f7a8b9c0d1e2f3a4', 'admin')
 ON DUPLICATE KEY UPDATE username=username;
 
--- Sample Data with BRANCH column (FIXED!)
-INSERT INTO students (roll_number, name, semester, subject, marks, branch, grade, grade_point) VALUES
+-- Sample Data with BRANCH column (FIXED!), staged by name and stored by dimension id
+CREATE TEMPORARY TABLE sample_students (
+    roll_number VARCHAR(50), name VARCHAR(100), semester VARCHAR(20), subject VARCHAR(100),
+    marks DECIMAL(5,2), branch VARCHAR(50), grade VARCHAR(10), grade_point DECIMAL(3,2)
+);
+INSERT INTO sample_students (roll_number, name, semester, subject, marks, branch, grade, grade_point) VALUES
 ('CS101', 'John Doe', 'Semester 1', 'Mathematics', 85, 'CSE', 'A', 9),
 ('CS101', 'John Doe', 'Semester 1', 'Physics', 78, 'CSE', 'B', 8),
 ('CS101', 'John Doe', 'Semester 1', 'Chemistry', 92, 'CSE', 'S', 10),
@@ -56,6 +182,52 @@ INSERT INTO students (roll_number, name, semester, subject, marks, branch, grade
 ('EC102', 'Bob Wilson', 'Semester 1', 'Physics', 70, 'ECE', 'B', 8),
 ('EC102', 'Bob Wilson', 'Semester 1', 'Chemistry', 68, 'ECE', 'C', 7);
 
+INSERT IGNORE INTO semesters (name) SELECT DISTINCT semester FROM sample_students ORDER BY semester;
+INSERT IGNORE INTO subjects (name) SELECT DISTINCT subject FROM sample_students ORDER BY subject;
+INSERT IGNORE INTO branches (name) SELECT DISTINCT branch FROM sample_students ORDER BY branch;
+
+INSERT INTO students (roll_number, name, semester_id, subject_id, marks, branch_id, grade, grade_point)
+SELECT s.roll_number, s.name, sem.id, subj.id, s.marks, br.id, s.grade, s.grade_point
+FROM sample_students s
+JOIN semesters sem ON sem.name = s.semester
+JOIN subjects subj ON subj.name = s.subject
+JOIN branches br ON br.name = s.branch;
+
+DROP TEMPORARY TABLE sample_students;
+
+-- Build summaries for the sample data
+INSERT INTO student_semester_summary (roll_number, semester_id, branch_id, name, subjects, credits, grade_points, sgpa)
+SELECT roll_number, semester_id, MAX(branch_id), MAX(name), COUNT(*), COUNT(*), SUM(grade_point), SUM(grade_point) / COUNT(*)
+FROM students
+GROUP BY roll_number, semester_id
+ON DUPLICATE KEY UPDATE sgpa = VALUES(sgpa);
+
+UPDATE student_semester_summary s
+JOIN (
+    SELECT roll_number, semester_id,
+           RANK() OVER (PARTITION BY semester_id, branch_id ORDER BY sgpa DESC) AS class_rank,
+           COUNT(*) OVER (PARTITION BY semester_id, branch_id) AS class_size
+    FROM student_semester_summary
+) ranked ON s.roll_number = ranked.roll_number AND s.semester_id = ranked.semester_id
+SET s.class_rank = ranked.class_rank, s.class_size = ranked.class_size;
+
+-- Build analytics rollups for the sample data
+INSERT INTO analytics_rollup (semester_id, branch_id, subject_id, grade, row_count, marks_sum, marks_count)
+SELECT semester_id, branch_id, subject_id, grade, COUNT(*), SUM(CASE WHEN marks >= 0 THEN marks ELSE 0 END), SUM(marks >= 0)
+FROM students
+GROUP BY semester_id, branch_id, subject_id, grade
+ON DUPLICATE KEY UPDATE row_count = VALUES(row_count), marks_sum = VALUES(marks_sum), marks_count = VALUES(marks_count);
+
+INSERT INTO mark_sketch (semester_id, branch_id, subject_id, bucket, row_count)
+SELECT semester_id, branch_id, subject_id, FLOOR(marks * 2), COUNT(*)
+FROM students
+WHERE marks >= 0
+GROUP BY semester_id, branch_id, subject_id, FLOOR(marks * 2)
+ON DUPLICATE KEY UPDATE row_count = VALUES(row_count);
+
+INSERT INTO app_state (name, version) VALUES ('analytics', 1)
+ON DUPLICATE KEY UPDATE version = version + 1;
+
 -- Verify setup
 SELECT 'Database setup complete!' AS Status;
 SELECT COUNT(*) AS total_students FROM students;
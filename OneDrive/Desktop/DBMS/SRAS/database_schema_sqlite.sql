@@ -0,0 +1,135 @@
+-- SQLite schema for local development and load testing (DB_BACKEND = 'sqlite').
+-- Mirrors database_schema.sql; the app creates it automatically in an empty database file.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'user' CHECK (role IN ('admin', 'user')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS semesters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    archived_at TIMESTAMP NULL
+);
+
+CREATE TABLE IF NOT EXISTS subjects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS branches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    roll_number TEXT NOT NULL,
+    name TEXT NOT NULL,
+    semester_id INTEGER NOT NULL REFERENCES semesters (id),
+    subject_id INTEGER NOT NULL REFERENCES subjects (id),
+    marks REAL NOT NULL,
+    branch_id INTEGER NOT NULL REFERENCES branches (id),
+    grade TEXT NOT NULL,
+    grade_point REAL NOT NULL,
+    row_hash TEXT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_roll_sem_subject ON students (roll_number, semester_id, subject_id);
+CREATE INDEX IF NOT EXISTS idx_grade ON students (grade);
+CREATE INDEX IF NOT EXISTS idx_sem_branch_roll_subject ON students (semester_id, branch_id, roll_number, subject_id);
+CREATE INDEX IF NOT EXISTS idx_branch_sem_roll_subject ON students (branch_id, semester_id, roll_number, subject_id);
+CREATE INDEX IF NOT EXISTS idx_subject_sem_branch_roll ON students (subject_id, semester_id, branch_id, roll_number);
+CREATE INDEX IF NOT EXISTS idx_sem_subject_marks ON students (semester_id, subject_id, marks);
+
+-- Results of archived semesters (SQLite has no partitioning; archiving only moves rows)
+CREATE TABLE IF NOT EXISTS students_archive (
+    id INTEGER PRIMARY KEY,
+    roll_number TEXT NOT NULL,
+    name TEXT NOT NULL,
+    semester_id INTEGER NOT NULL REFERENCES semesters (id),
+    subject_id INTEGER NOT NULL REFERENCES subjects (id),
+    marks REAL NOT NULL,
+    branch_id INTEGER NOT NULL REFERENCES branches (id),
+    grade TEXT NOT NULL,
+    grade_point REAL NOT NULL,
+    row_hash TEXT NULL,
+    created_at TIMESTAMP NULL,
+    updated_at TIMESTAMP NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_archive_roll_sem_subject ON students_archive (roll_number, semester_id, subject_id);
+CREATE INDEX IF NOT EXISTS idx_archive_sem_branch_roll_subject ON students_archive (semester_id, branch_id, roll_number, subject_id);
+CREATE INDEX IF NOT EXISTS idx_archive_branch_sem_roll_subject ON students_archive (branch_id, semester_id, roll_number, subject_id);
+CREATE INDEX IF NOT EXISTS idx_archive_subject_sem_branch_roll ON students_archive (subject_id, semester_id, branch_id, roll_number);
+
+CREATE VIEW IF NOT EXISTS students_history AS
+SELECT id, roll_number, name, semester_id, subject_id, marks, branch_id, grade, grade_point, row_hash, created_at, updated_at
+FROM students
+UNION ALL
+SELECT id, roll_number, name, semester_id, subject_id, marks, branch_id, grade, grade_point, row_hash, created_at, updated_at
+FROM students_archive;
+
+CREATE TABLE IF NOT EXISTS student_semester_summary (
+    roll_number TEXT NOT NULL,
+    semester_id INTEGER NOT NULL,
+    branch_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    subjects INTEGER NOT NULL DEFAULT 0,
+    credits INTEGER NOT NULL DEFAULT 0,
+    grade_points REAL NOT NULL DEFAULT 0,
+    sgpa REAL NOT NULL DEFAULT 0,
+    class_rank INTEGER NULL,
+    class_size INTEGER NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (roll_number, semester_id)
+);
+CREATE INDEX IF NOT EXISTS idx_summary_sem_branch_sgpa ON student_semester_summary (semester_id, branch_id, sgpa);
+
+CREATE TABLE IF NOT EXISTS analytics_rollup (
+    semester_id INTEGER NOT NULL,
+    branch_id INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    grade TEXT NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    marks_sum REAL NOT NULL DEFAULT 0,
+    marks_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (semester_id, branch_id, subject_id, grade)
+);
+CREATE INDEX IF NOT EXISTS idx_rollup_branch ON analytics_rollup (branch_id);
+
+CREATE TABLE IF NOT EXISTS mark_sketch (
+    semester_id INTEGER NOT NULL,
+    branch_id INTEGER NOT NULL,
+    subject_id INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    row_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (semester_id, branch_id, subject_id, bucket)
+);
+CREATE INDEX IF NOT EXISTS idx_sketch_branch ON mark_sketch (branch_id);
+
+CREATE TABLE IF NOT EXISTS app_state (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'done', 'failed')),
+    processed INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NULL,
+    rows_per_sec REAL NOT NULL DEFAULT 0,
+    error_count INTEGER NOT NULL DEFAULT 0,
+    errors TEXT NULL,
+    message TEXT NULL,
+    created_by TEXT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP NULL,
+    finished_at TIMESTAMP NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status);
@@ -0,0 +1,418 @@
+"""
+Database access layer: a bounded connection pool with MySQL and SQLite backends.
+
+The app writes MySQL-flavoured SQL with %s placeholders. The SQLite backend
+translates the few constructs the app uses (placeholders, NOW(), INSERT IGNORE,
+ON DUPLICATE KEY UPDATE) so the whole app can run locally without a MySQL server.
+"""
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from flask import g
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes free within DB_POOL_TIMEOUT seconds"""
+
+
+# ==========================================
+# BACKENDS
+# ==========================================
+
+class MySQLBackend:
+    dialect = 'mysql'
+    observer = None
+
+    def __init__(self, config):
+        import MySQLdb
+        import MySQLdb.cursors
+        self.driver = MySQLdb
+        self.dict_cursor = MySQLdb.cursors.DictCursor
+        self.stream_cursor = MySQLdb.cursors.SSDictCursor
+        self.IntegrityError = MySQLdb.IntegrityError
+        self.options = {
+            'host': config['MYSQL_HOST'],
+            'user': config['MYSQL_USER'],
+            'passwd': config['MYSQL_PASSWORD'],
+            'db': config['MYSQL_DB'],
+            'port': config.get('MYSQL_PORT', 3306),
+            'charset': 'utf8mb4',
+            'use_unicode': True,
+        }
+        self.options.update(config.get('MYSQL_CUSTOM_OPTIONS') or {})
+
+    def connect(self):
+        return self.driver.connect(**self.options)
+
+    def ping(self, raw):
+        try:
+            raw.ping()
+            return True
+        except Exception:
+            return False
+
+    def translate(self, sql):
+        return sql
+
+    def cursor(self, raw, dictionary=False, stream=False):
+        if stream:
+            return raw.cursor(self.stream_cursor)
+        return raw.cursor(self.dict_cursor) if dictionary else raw.cursor()
+
+
+class SQLiteBackend:
+    dialect = 'sqlite'
+    observer = None
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(self, config):
+        self.path = config['SQLITE_PATH']
+        self.busy_timeout = config['SQLITE_BUSY_TIMEOUT']
+        self.statement_cache = config['DB_STATEMENT_CACHE']
+        self.schema_path = config['SQLITE_SCHEMA']
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connect(self):
+        # PARSE_DECLTYPES returns TIMESTAMP columns as datetime, like MySQLdb does
+        raw = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False,
+                              cached_statements=self.statement_cache, detect_types=sqlite3.PARSE_DECLTYPES)
+        raw.execute('PRAGMA journal_mode=WAL')
+        raw.execute('PRAGMA foreign_keys=ON')
+        self._ensure_schema(raw)
+        return raw
+
+    def _ensure_schema(self, raw):
+        """Create the tables on first use of an empty database file"""
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            exists = raw.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'students'").fetchone()
+            if not exists:
+                with open(self.schema_path, encoding='utf-8') as f:
+                    raw.executescript(f.read())
+            self._schema_ready = True
+
+    def ping(self, raw):
+        try:
+            raw.execute('SELECT 1')
+            return True
+        except Exception:
+            return False
+
+    def translate(self, sql):
+        return translate_mysql_to_sqlite(sql)
+
+    def cursor(self, raw, dictionary=False, stream=False):
+        return raw.cursor()
+
+
+@lru_cache(maxsize=512)
+def translate_mysql_to_sqlite(sql):
+    """
+    Rewrite the MySQL constructs used by the app into SQLite syntax. Cached per
+    statement text, so the fixed statements are translated once and SQLite's own
+    statement cache can reuse their compiled form.
+    """
+    sql = sql.replace('%s', '?')
+    sql = re.sub(r'\bNOW\(\)', 'CURRENT_TIMESTAMP', sql)
+    sql = re.sub(r'\bINSERT IGNORE\b', 'INSERT OR IGNORE', sql)
+    sql = re.sub(r'ON DUPLICATE KEY UPDATE', 'ON CONFLICT DO UPDATE SET', sql)
+    sql = re.sub(r'\bVALUES\((\w+)\)', r'excluded.\1', sql)
+    return sql
+
+
+# ==========================================
+# CONNECTIONS
+# ==========================================
+
+READ_STATEMENT = re.compile(r'\s*(SELECT|WITH|SHOW|EXPLAIN)\b', re.IGNORECASE)
+
+
+class Cursor:
+    """
+    DB-API cursor wrapper giving both backends the same %s / dict-row interface.
+    When the backend has an observer, each statement's latency and row count is
+    reported under its name (by default the calling function's name).
+    """
+
+    def __init__(self, raw, backend, dictionary=False):
+        self.raw = raw
+        self.backend = backend
+        self.dictionary = dictionary
+        self.name = None
+
+    def _run(self, method, sql, args, name):
+        observer = self.backend.observer
+        if observer is None:
+            method(self.backend.translate(sql), args)
+            return self
+        if name is None:
+            # Nested helpers read as outer.inner, e.g. get_filter_options.load
+            code = sys._getframe(2).f_code
+            name = getattr(code, 'co_qualname', code.co_name).replace('<locals>.', '')
+        self.name = name
+        started = time.perf_counter()
+        method(self.backend.translate(sql), args)
+        observer.query(self.name, sql, time.perf_counter() - started, self._changed_rows(sql))
+        return self
+
+    def _changed_rows(self, sql):
+        # SELECT rows are counted as they are fetched; rowcount is unreliable for them
+        return None if READ_STATEMENT.match(sql) else self.raw.rowcount
+
+    def execute(self, sql, params=None, name=None):
+        return self._run(self.raw.execute, sql, tuple(params) if params is not None else (), name)
+
+    def executemany(self, sql, seq_of_params, name=None):
+        return self._run(self.raw.executemany, sql, seq_of_params, name)
+
+    def _convert(self, row):
+        if row is None or not self.dictionary or isinstance(row, dict):
+            return row
+        return dict(zip([d[0] for d in self.raw.description], row))
+
+    def _fetched(self, count):
+        if self.backend.observer is not None and self.name is not None:
+            self.backend.observer.rows(self.name, count)
+
+    def fetchone(self):
+        row = self.raw.fetchone()
+        self._fetched(row is not None)
+        return self._convert(row)
+
+    def fetchmany(self, size):
+        rows = self.raw.fetchmany(size)
+        self._fetched(len(rows))
+        return [self._convert(row) for row in rows]
+
+    def fetchall(self):
+        rows = self.raw.fetchall()
+        self._fetched(len(rows))
+        return [self._convert(row) for row in rows]
+
+    def __iter__(self):
+        while True:
+            row = self.raw.fetchone()
+            if row is None:
+                return
+            self._fetched(1)
+            yield self._convert(row)
+
+    @property
+    def rowcount(self):
+        return self.raw.rowcount
+
+    @property
+    def lastrowid(self):
+        return self.raw.lastrowid
+
+    @property
+    def description(self):
+        return self.raw.description
+
+    def close(self):
+        self.raw.close()
+
+
+class Connection:
+    """A raw driver connection plus the bookkeeping the pool needs"""
+
+    def __init__(self, raw, backend, pool=None):
+        self.raw = raw
+        self.backend = backend
+        self.pool = pool
+        self.created_at = time.monotonic()
+
+    def cursor(self, dictionary=False, stream=False):
+        """Open a cursor; dictionary=True returns rows as dicts, stream=True leaves results on the server"""
+        return Cursor(self.backend.cursor(self.raw, dictionary, stream), self.backend, dictionary or stream)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        """Return a pooled connection to its pool, or close an unpooled one"""
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            self.raw.close()
+
+
+class ConnectionPool:
+    """
+    Bounded pool: up to pool_size idle connections are kept, and up to max_overflow
+    extra ones are opened under load and closed when returned. Connections are
+    pinged before reuse (pre_ping) and replaced once older than recycle seconds.
+    """
+
+    def __init__(self, backend, pool_size=5, max_overflow=10, timeout=30, recycle=3600, pre_ping=True):
+        self.backend = backend
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self._idle = deque()
+        self._checked_out = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while not self._idle and self._checked_out >= self.pool_size + self.max_overflow:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f'No database connection available after {self.timeout}s')
+                self._cond.wait(remaining)
+            conn = self._idle.pop() if self._idle else None
+            self._checked_out += 1
+
+        try:
+            if conn is not None and not self._usable(conn):
+                self._discard(conn)
+                conn = None
+            if conn is None:
+                conn = Connection(self.backend.connect(), self.backend, self)
+            return conn
+        except Exception:
+            with self._cond:
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+
+    def _usable(self, conn):
+        if self.recycle and time.monotonic() - conn.created_at > self.recycle:
+            return False
+        return not self.pre_ping or self.backend.ping(conn.raw)
+
+    def _discard(self, conn):
+        try:
+            conn.raw.close()
+        except Exception:
+            pass
+
+    def release(self, conn):
+        # Never hand the next borrower someone else's open transaction
+        try:
+            conn.raw.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            self._checked_out -= 1
+            keep = healthy and len(self._idle) < self.pool_size
+            if keep:
+                self._idle.append(conn)
+            self._cond.notify()
+        if not keep:
+            self._discard(conn)
+
+    def status(self):
+        with self._cond:
+            return {'idle': len(self._idle), 'checked_out': self._checked_out,
+                    'pool_size': self.pool_size, 'max_overflow': self.max_overflow}
+
+
+# ==========================================
+# FLASK INTEGRATION
+# ==========================================
+
+class Database:
+    """
+    Flask extension: db.connection is a pooled connection bound to the current app
+    context and returned to the pool at teardown; db.connect() opens a separate
+    unpooled connection the caller must close.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self._backend = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self._observer = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DB_BACKEND', 'mysql')
+        app.config.setdefault('SQLITE_PATH', 'student_result.db')
+        app.config.setdefault('SQLITE_SCHEMA', os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                            'database_schema_sqlite.sql'))
+        app.config.setdefault('SQLITE_BUSY_TIMEOUT', 30)
+        app.config.setdefault('DB_POOL_SIZE', 5)
+        app.config.setdefault('DB_MAX_OVERFLOW', 10)
+        app.config.setdefault('DB_POOL_TIMEOUT', 30)
+        app.config.setdefault('DB_POOL_RECYCLE', 3600)
+        app.config.setdefault('DB_POOL_PRE_PING', True)
+        app.config.setdefault('DB_STATEMENT_CACHE', 256)
+        self.app = app
+        app.teardown_appcontext(self.teardown)
+
+    def _setup(self):
+        with self._lock:
+            if self._pool is None:
+                config = self.app.config
+                backend_class = SQLiteBackend if config['DB_BACKEND'] == 'sqlite' else MySQLBackend
+                self._backend = backend_class(config)
+                self._backend.observer = self.observer
+                self._pool = ConnectionPool(self._backend,
+                                            pool_size=config['DB_POOL_SIZE'],
+                                            max_overflow=config['DB_MAX_OVERFLOW'],
+                                            timeout=config['DB_POOL_TIMEOUT'],
+                                            recycle=config['DB_POOL_RECYCLE'],
+                                            pre_ping=config['DB_POOL_PRE_PING'])
+        return self._pool
+
+    @property
+    def observer(self):
+        return self._observer
+
+    @observer.setter
+    def observer(self, observer):
+        """Receives query(name, sql, seconds, rowcount) and rows(name, count) calls, e.g. metrics.Metrics"""
+        self._observer = observer
+        if self._backend is not None:
+            self._backend.observer = observer
+
+    @property
+    def pool(self):
+        return self._pool or self._setup()
+
+    @property
+    def backend(self):
+        self.pool
+        return self._backend
+
+    @property
+    def dialect(self):
+        return self.backend.dialect
+
+    @property
+    def IntegrityError(self):
+        return self.backend.IntegrityError
+
+    @property
+    def connection(self):
+        if 'db_connection' not in g:
+            g.db_connection = self.pool.acquire()
+        return g.db_connection
+
+    def connect(self):
+        return Connection(self.backend.connect(), self.backend)
+
+    def teardown(self, exception):
+        conn = g.pop('db_connection', None)
+        if conn is not None:
+            conn.close()
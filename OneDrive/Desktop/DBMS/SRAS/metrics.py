@@ -0,0 +1,236 @@
+"""
+Request, query and template instrumentation exposed in Prometheus text format.
+
+Metrics live in process memory, so each worker process reports its own series;
+scrape every worker (or run a single process) when deploying behind gunicorn.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, before_render_template, g, has_request_context, request, session, template_rendered
+
+logger = logging.getLogger('sras.metrics')
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+# ==========================================
+# METRIC TYPES
+# ==========================================
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            yield f'{self.name}{_format_labels(self.labels, label_values)} {value:g}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for label_values, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = 'le="%g"' % bound
+                yield f'{self.name}_bucket{_format_labels(self.labels, label_values, le)} {count}'
+            le = 'le="+Inf"'
+            yield f'{self.name}_bucket{_format_labels(self.labels, label_values, le)} {series[-2]}'
+            yield f'{self.name}_sum{_format_labels(self.labels, label_values)} {series[-1]:.6f}'
+            yield f'{self.name}_count{_format_labels(self.labels, label_values)} {series[-2]}'
+
+
+# ==========================================
+# FLASK INTEGRATION
+# ==========================================
+
+class Metrics:
+    """
+    Flask extension timing every request, every SQL statement run through a
+    db.py cursor and every template render. Statements are labelled with the
+    name passed to cursor.execute(..., name=...) or, by default, the function
+    that issued them. Each response carries a Server-Timing header splitting
+    its time into db, template and total, and requests or statements slower
+    than SLOW_REQUEST_THRESHOLD / SLOW_QUERY_THRESHOLD seconds are logged.
+    /metrics answers clients in METRICS_ALLOWED_IPS and logged-in admins only.
+    """
+
+    def __init__(self, app=None, db=None):
+        self.request_duration = Histogram('sras_request_duration_seconds', 'Time spent handling a request',
+                                          ('route', 'method', 'status'))
+        self.request_db_duration = Histogram('sras_request_db_seconds', 'SQL time spent inside a request',
+                                             ('route',))
+        self.query_duration = Histogram('sras_query_duration_seconds', 'SQL statement execution time',
+                                        ('query',))
+        self.query_rows = Counter('sras_query_rows_total', 'Rows returned or changed by SQL statements',
+                                  ('query',))
+        self.template_duration = Histogram('sras_template_render_seconds', 'Jinja template render time',
+                                           ('template',))
+        self.errors = Counter('sras_errors_total', 'Unhandled exceptions', ('where',))
+        self.slow_queries = Counter('sras_slow_queries_total', 'Statements over SLOW_QUERY_THRESHOLD',
+                                    ('query',))
+        self.cache_lookups = Counter('sras_cache_lookups_total', 'Result cache lookups by outcome',
+                                     ('cache', 'outcome'))
+        self.registry = [self.request_duration, self.request_db_duration, self.query_duration,
+                         self.query_rows, self.template_duration, self.errors, self.slow_queries,
+                         self.cache_lookups]
+        self.app = None
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db=None):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+        app.config.setdefault('SLOW_QUERY_THRESHOLD', 0.5)
+        app.config.setdefault('SLOW_REQUEST_THRESHOLD', 1.0)
+        self.app = app
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.add_url_rule('/metrics', 'metrics', self.export)
+        if db is not None:
+            db.observer = self
+
+    # ----- requests -----
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_db_seconds = 0.0
+        g.metrics_template_seconds = 0.0
+
+    def _route(self):
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    def _after_request(self, response):
+        started = g.get('metrics_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        route = self._route()
+        db_seconds = g.metrics_db_seconds
+        template_seconds = g.metrics_template_seconds
+
+        self.request_duration.observe(elapsed, route, request.method, str(response.status_code))
+        self.request_db_duration.observe(db_seconds, route)
+        response.headers['Server-Timing'] = (f'db;dur={db_seconds * 1000:.1f}, '
+                                             f'tpl;dur={template_seconds * 1000:.1f}, '
+                                             f'total;dur={elapsed * 1000:.1f}')
+        if elapsed >= self.app.config['SLOW_REQUEST_THRESHOLD']:
+            logger.warning('Slow request %s %s: %.3fs (db %.3fs, templates %.3fs, other %.3fs)',
+                           request.method, request.full_path.rstrip('?'), elapsed, db_seconds, template_seconds,
+                           elapsed - db_seconds - template_seconds)
+        return response
+
+    def _teardown_request(self, exception):
+        if exception is not None:
+            self.errors.inc(self._route())
+
+    # ----- templates -----
+
+    def _before_render(self, sender, template, context, **extra):
+        g.setdefault('metrics_render_stack', []).append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        stack = g.get('metrics_render_stack')
+        if not stack:
+            return
+        elapsed = time.perf_counter() - stack.pop()
+        self.template_duration.observe(elapsed, template.name or 'inline')
+        # Only the outermost render counts towards the request total
+        if not stack and 'metrics_template_seconds' in g:
+            g.metrics_template_seconds += elapsed
+
+    # ----- queries (called by db.Cursor) -----
+
+    def query(self, name, sql, seconds, rowcount):
+        self.query_duration.observe(seconds, name)
+        if rowcount is not None and rowcount > 0:
+            self.query_rows.inc(name, amount=rowcount)
+        if has_request_context() and 'metrics_db_seconds' in g:
+            g.metrics_db_seconds += seconds
+        if seconds >= self.app.config['SLOW_QUERY_THRESHOLD']:
+            self.slow_queries.inc(name)
+            logger.warning('Slow query %s: %.3fs: %s', name, seconds, ' '.join(sql.split())[:500])
+
+    def rows(self, name, count):
+        if count:
+            self.query_rows.inc(name, amount=count)
+
+    def cache(self, name, outcome):
+        """Count a cache lookup; outcome is 'hit', 'miss' or 'not_modified'"""
+        self.cache_lookups.inc(name, outcome)
+
+    def error(self, where=None):
+        """Count and log the exception being handled; where defaults to the current endpoint"""
+        if where is None:
+            where = request.endpoint if has_request_context() else 'background'
+        self.errors.inc(where)
+        logger.error('Error in %s', where, exc_info=True)
+
+    # ----- export -----
+
+    def render(self):
+        lines = []
+        for metric in self.registry:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        if request.remote_addr not in self.app.config['METRICS_ALLOWED_IPS'] and session.get('role') != 'admin':
+            return Response('Forbidden\n', status=403, mimetype='text/plain')
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,20 @@
+-- Replace the single-column semester/subject/branch indexes with composite ones
+-- matching how the app actually reads the students table.
+USE student_result_db;
+
+ALTER TABLE students
+    -- Results listing and keyset pagination (ORDER BY semester, branch, roll_number, subject, id),
+    -- dashboard totals filtered by semester (and branch)
+    ADD INDEX idx_sem_branch_roll_subject (semester, branch, roll_number, subject),
+    -- Same ordering when only a branch is filtered
+    ADD INDEX idx_branch_sem_roll_subject (branch, semester, roll_number, subject),
+    -- Same ordering when a subject is filtered; also covers SELECT DISTINCT semester, subject, branch
+    ADD INDEX idx_subject_sem_branch_roll (subject, semester, branch, roll_number),
+    -- Relative grading: WHERE semester = ? AND subject = ? AND marks >= 0, covering id and marks
+    ADD INDEX idx_sem_subject_marks (semester, subject, marks),
+    -- Each old index is a prefix of a composite one above
+    DROP INDEX idx_semester,
+    DROP INDEX idx_subject,
+    DROP INDEX idx_branch;
+
+ANALYZE TABLE students;
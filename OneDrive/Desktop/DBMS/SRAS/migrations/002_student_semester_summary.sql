@@ -0,0 +1,37 @@
+-- Per-student semester summary table (SGPA, credits, class rank within branch/semester),
+-- backfilled from the existing students rows. The app keeps it current incrementally
+-- from add_student, upload_results and apply_relative_grading.
+USE student_result_db;
+
+CREATE TABLE IF NOT EXISTS student_semester_summary (
+    roll_number VARCHAR(50) NOT NULL,
+    semester VARCHAR(20) NOT NULL,
+    branch VARCHAR(50) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    subjects INT NOT NULL DEFAULT 0,
+    credits INT NOT NULL DEFAULT 0,
+    grade_points DECIMAL(8,2) NOT NULL DEFAULT 0,
+    sgpa DECIMAL(4,2) NOT NULL DEFAULT 0,
+    class_rank INT NULL,
+    class_size INT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (roll_number, semester),
+    INDEX idx_sem_branch_sgpa (semester, branch, sgpa)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Every subject carries one credit, so SGPA is the mean grade point of the semester
+INSERT INTO student_semester_summary (roll_number, semester, branch, name, subjects, credits, grade_points, sgpa)
+SELECT roll_number, semester, MAX(branch), MAX(name), COUNT(*), COUNT(*), SUM(grade_point), SUM(grade_point) / COUNT(*)
+FROM students
+GROUP BY roll_number, semester
+ON DUPLICATE KEY UPDATE branch = VALUES(branch), name = VALUES(name), subjects = VALUES(subjects),
+    credits = VALUES(credits), grade_points = VALUES(grade_points), sgpa = VALUES(sgpa);
+
+UPDATE student_semester_summary s
+JOIN (
+    SELECT roll_number, semester,
+           RANK() OVER (PARTITION BY semester, branch ORDER BY sgpa DESC) AS class_rank,
+           COUNT(*) OVER (PARTITION BY semester, branch) AS class_size
+    FROM student_semester_summary
+) ranked ON s.roll_number = ranked.roll_number AND s.semester = ranked.semester
+SET s.class_rank = ranked.class_rank, s.class_size = ranked.class_size;
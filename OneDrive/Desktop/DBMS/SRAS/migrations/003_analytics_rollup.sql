@@ -0,0 +1,32 @@
+-- Rollup table behind /api/analytics, backfilled from students. The app applies
+-- per-group deltas on inserts and rebuilds the affected groups on re-grading.
+USE student_result_db;
+
+-- Pre-aggregated analytics (counts and mark sums per semester/branch/subject/grade), maintained on every write
+CREATE TABLE IF NOT EXISTS analytics_rollup (
+    semester VARCHAR(20) NOT NULL,
+    branch VARCHAR(50) NOT NULL,
+    subject VARCHAR(100) NOT NULL,
+    grade VARCHAR(10) NOT NULL,
+    row_count INT NOT NULL DEFAULT 0,
+    marks_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+    marks_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (semester, branch, subject, grade),
+    INDEX idx_branch (branch)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Version counters for derived data (used for HTTP ETags)
+CREATE TABLE IF NOT EXISTS app_state (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO analytics_rollup (semester, branch, subject, grade, row_count, marks_sum, marks_count)
+SELECT semester, branch, subject, grade, COUNT(*), SUM(CASE WHEN marks >= 0 THEN marks ELSE 0 END), SUM(marks >= 0)
+FROM students
+GROUP BY semester, branch, subject, grade
+ON DUPLICATE KEY UPDATE row_count = VALUES(row_count), marks_sum = VALUES(marks_sum), marks_count = VALUES(marks_count);
+
+INSERT INTO app_state (name, version) VALUES ('analytics', 1)
+ON DUPLICATE KEY UPDATE version = version + 1;
@@ -0,0 +1,98 @@
+-- Dictionary-encode semester, subject and branch: the names move into small
+-- dimension tables and students, student_semester_summary and analytics_rollup
+-- keep SMALLINT ids, so rows shrink and indexes, filters and GROUP BYs work on
+-- integers. Run once against a database at migration 003.
+USE student_result_db;
+
+CREATE TABLE IF NOT EXISTS semesters (
+    id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(20) NOT NULL UNIQUE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS subjects (
+    id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL UNIQUE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS branches (
+    id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(50) NOT NULL UNIQUE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Ids are handed out in name order for the existing data
+INSERT IGNORE INTO semesters (name) SELECT DISTINCT semester FROM students ORDER BY semester;
+INSERT IGNORE INTO subjects (name) SELECT DISTINCT subject FROM students ORDER BY subject;
+INSERT IGNORE INTO branches (name) SELECT DISTINCT branch FROM students ORDER BY branch;
+
+-- students
+ALTER TABLE students
+    ADD COLUMN semester_id SMALLINT UNSIGNED NULL AFTER name,
+    ADD COLUMN subject_id SMALLINT UNSIGNED NULL AFTER semester_id,
+    ADD COLUMN branch_id SMALLINT UNSIGNED NULL AFTER marks;
+
+UPDATE students s
+JOIN semesters sem ON sem.name = s.semester
+JOIN subjects subj ON subj.name = s.subject
+JOIN branches br ON br.name = s.branch
+SET s.semester_id = sem.id, s.subject_id = subj.id, s.branch_id = br.id;
+
+ALTER TABLE students
+    DROP INDEX idx_sem_branch_roll_subject,
+    DROP INDEX idx_branch_sem_roll_subject,
+    DROP INDEX idx_subject_sem_branch_roll,
+    DROP INDEX idx_sem_subject_marks,
+    DROP COLUMN semester,
+    DROP COLUMN subject,
+    DROP COLUMN branch,
+    MODIFY semester_id SMALLINT UNSIGNED NOT NULL,
+    MODIFY subject_id SMALLINT UNSIGNED NOT NULL,
+    MODIFY branch_id SMALLINT UNSIGNED NOT NULL,
+    ADD INDEX idx_sem_branch_roll_subject (semester_id, branch_id, roll_number, subject_id),
+    ADD INDEX idx_branch_sem_roll_subject (branch_id, semester_id, roll_number, subject_id),
+    ADD INDEX idx_subject_sem_branch_roll (subject_id, semester_id, branch_id, roll_number),
+    ADD INDEX idx_sem_subject_marks (semester_id, subject_id, marks),
+    ADD CONSTRAINT fk_students_semester FOREIGN KEY (semester_id) REFERENCES semesters (id),
+    ADD CONSTRAINT fk_students_subject FOREIGN KEY (subject_id) REFERENCES subjects (id),
+    ADD CONSTRAINT fk_students_branch FOREIGN KEY (branch_id) REFERENCES branches (id);
+
+-- student_semester_summary
+ALTER TABLE student_semester_summary
+    ADD COLUMN semester_id SMALLINT UNSIGNED NULL AFTER roll_number,
+    ADD COLUMN branch_id SMALLINT UNSIGNED NULL AFTER semester_id;
+
+UPDATE student_semester_summary s
+JOIN semesters sem ON sem.name = s.semester
+JOIN branches br ON br.name = s.branch
+SET s.semester_id = sem.id, s.branch_id = br.id;
+
+ALTER TABLE student_semester_summary
+    DROP PRIMARY KEY,
+    DROP INDEX idx_sem_branch_sgpa,
+    DROP COLUMN semester,
+    DROP COLUMN branch,
+    MODIFY semester_id SMALLINT UNSIGNED NOT NULL,
+    MODIFY branch_id SMALLINT UNSIGNED NOT NULL,
+    ADD PRIMARY KEY (roll_number, semester_id),
+    ADD INDEX idx_sem_branch_sgpa (semester_id, branch_id, sgpa);
+
+-- analytics_rollup is derived data, so it is rebuilt rather than converted
+DROP TABLE IF EXISTS analytics_rollup;
+CREATE TABLE analytics_rollup (
+    semester_id SMALLINT UNSIGNED NOT NULL,
+    branch_id SMALLINT UNSIGNED NOT NULL,
+    subject_id SMALLINT UNSIGNED NOT NULL,
+    grade VARCHAR(10) NOT NULL,
+    row_count INT NOT NULL DEFAULT 0,
+    marks_sum DECIMAL(14,2) NOT NULL DEFAULT 0,
+    marks_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (semester_id, branch_id, subject_id, grade),
+    INDEX idx_branch (branch_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO analytics_rollup (semester_id, branch_id, subject_id, grade, row_count, marks_sum, marks_count)
+SELECT semester_id, branch_id, subject_id, grade, COUNT(*), SUM(CASE WHEN marks >= 0 THEN marks ELSE 0 END), SUM(marks >= 0)
+FROM students
+GROUP BY semester_id, branch_id, subject_id, grade;
+
+INSERT INTO app_state (name, version) VALUES ('analytics', 1)
+ON DUPLICATE KEY UPDATE version = version + 1;
@@ -0,0 +1,43 @@
+-- Make (roll_number, semester_id, subject_id) the natural key of a result so that
+-- re-uploaded sheets can be upserted, and add the row_hash used to skip rows whose
+-- values did not change. Duplicate results are collapsed to the most recently
+-- inserted row first. Run once against a database at migration 004.
+USE student_result_db;
+
+DELETE s FROM students s
+JOIN students newer
+  ON newer.roll_number = s.roll_number
+ AND newer.semester_id = s.semester_id
+ AND newer.subject_id = s.subject_id
+ AND newer.id > s.id;
+
+ALTER TABLE students
+    ADD COLUMN row_hash CHAR(16) NULL AFTER grade_point,
+    DROP INDEX idx_roll,
+    ADD UNIQUE KEY uq_roll_sem_subject (roll_number, semester_id, subject_id);
+
+-- The removed duplicates were counted in the derived tables; recompute them
+INSERT INTO student_semester_summary (roll_number, semester_id, branch_id, name, subjects, credits, grade_points, sgpa)
+SELECT roll_number, semester_id, MAX(branch_id), MAX(name), COUNT(*), COUNT(*), SUM(grade_point), SUM(grade_point) / COUNT(*)
+FROM students
+GROUP BY roll_number, semester_id
+ON DUPLICATE KEY UPDATE branch_id = VALUES(branch_id), name = VALUES(name), subjects = VALUES(subjects),
+    credits = VALUES(credits), grade_points = VALUES(grade_points), sgpa = VALUES(sgpa);
+
+UPDATE student_semester_summary s
+JOIN (
+    SELECT roll_number, semester_id,
+           RANK() OVER (PARTITION BY semester_id, branch_id ORDER BY sgpa DESC) AS class_rank,
+           COUNT(*) OVER (PARTITION BY semester_id, branch_id) AS class_size
+    FROM student_semester_summary
+) ranked ON s.roll_number = ranked.roll_number AND s.semester_id = ranked.semester_id
+SET s.class_rank = ranked.class_rank, s.class_size = ranked.class_size;
+
+DELETE FROM analytics_rollup;
+INSERT INTO analytics_rollup (semester_id, branch_id, subject_id, grade, row_count, marks_sum, marks_count)
+SELECT semester_id, branch_id, subject_id, grade, COUNT(*), SUM(CASE WHEN marks >= 0 THEN marks ELSE 0 END), SUM(marks >= 0)
+FROM students
+GROUP BY semester_id, branch_id, subject_id, grade;
+
+INSERT INTO app_state (name, version) VALUES ('analytics', 1)
+ON DUPLICATE KEY UPDATE version = version + 1;
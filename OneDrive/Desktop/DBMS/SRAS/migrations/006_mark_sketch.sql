@@ -0,0 +1,25 @@
+-- Per-cohort mark sketches: valid marks counted per half-mark bucket for every
+-- (semester, branch, subject). Summing buckets over any set of cohorts merges
+-- their sketches, so /api/statistics answers medians, quartiles and histograms
+-- without scanning students. Run once against a database at migration 005.
+USE student_result_db;
+
+CREATE TABLE IF NOT EXISTS mark_sketch (
+    semester_id SMALLINT UNSIGNED NOT NULL,
+    branch_id SMALLINT UNSIGNED NOT NULL,
+    subject_id SMALLINT UNSIGNED NOT NULL,
+    bucket SMALLINT UNSIGNED NOT NULL,
+    row_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (semester_id, branch_id, subject_id, bucket),
+    INDEX idx_branch (branch_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+DELETE FROM mark_sketch;
+INSERT INTO mark_sketch (semester_id, branch_id, subject_id, bucket, row_count)
+SELECT semester_id, branch_id, subject_id, FLOOR(marks * 2), COUNT(*)
+FROM students
+WHERE marks >= 0
+GROUP BY semester_id, branch_id, subject_id, FLOOR(marks * 2);
+
+INSERT INTO app_state (name, version) VALUES ('analytics', 1)
+ON DUPLICATE KEY UPDATE version = version + 1;
@@ -0,0 +1,55 @@
+-- Partition students by semester and add the compressed archive for closed semesters.
+-- Queries filtered to one semester then touch a single partition, and
+-- `flask --app app archive-term "<semester>"` moves a closed semester into
+-- students_archive, which the app reads through routing or the students_history view.
+-- Partitioned InnoDB tables cannot have foreign keys and need the partition column in
+-- every unique key, so the dimension foreign keys are dropped and the primary key
+-- becomes (id, semester_id). Rebuilds students; run once against a database at migration 006.
+USE student_result_db;
+
+ALTER TABLE semesters
+    ADD COLUMN archived_at TIMESTAMP NULL;
+
+-- Databases migrated with an older 004 have server-generated names (students_ibfk_N) for
+-- these constraints, so drop whatever foreign keys students has by their actual names
+SET @drop_foreign_keys = (
+    SELECT CONCAT('ALTER TABLE students ', GROUP_CONCAT(CONCAT('DROP FOREIGN KEY `', CONSTRAINT_NAME, '`') SEPARATOR ', '))
+    FROM information_schema.TABLE_CONSTRAINTS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'students' AND CONSTRAINT_TYPE = 'FOREIGN KEY'
+);
+PREPARE drop_foreign_keys FROM COALESCE(@drop_foreign_keys, 'DO 0');
+EXECUTE drop_foreign_keys;
+DEALLOCATE PREPARE drop_foreign_keys;
+
+ALTER TABLE students
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, semester_id);
+
+ALTER TABLE students
+    PARTITION BY HASH (semester_id) PARTITIONS 16;
+
+CREATE TABLE IF NOT EXISTS students_archive (
+    id INT NOT NULL PRIMARY KEY,
+    roll_number VARCHAR(50) NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    semester_id SMALLINT UNSIGNED NOT NULL,
+    subject_id SMALLINT UNSIGNED NOT NULL,
+    marks DECIMAL(5,2) NOT NULL,
+    branch_id SMALLINT UNSIGNED NOT NULL,
+    grade VARCHAR(10) NOT NULL,
+    grade_point DECIMAL(3,2) NOT NULL,
+    row_hash CHAR(16) NULL,
+    created_at TIMESTAMP NULL,
+    updated_at TIMESTAMP NULL,
+    UNIQUE KEY uq_roll_sem_subject (roll_number, semester_id, subject_id),
+    INDEX idx_sem_branch_roll_subject (semester_id, branch_id, roll_number, subject_id),
+    INDEX idx_branch_sem_roll_subject (branch_id, semester_id, roll_number, subject_id),
+    INDEX idx_subject_sem_branch_roll (subject_id, semester_id, branch_id, roll_number)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+
+CREATE OR REPLACE VIEW students_history AS
+SELECT id, roll_number, name, semester_id, subject_id, marks, branch_id, grade, grade_point, row_hash, created_at, updated_at
+FROM students
+UNION ALL
+SELECT id, roll_number, name, semester_id, subject_id, marks, branch_id, grade, grade_point, row_hash, created_at, updated_at
+FROM students_archive;
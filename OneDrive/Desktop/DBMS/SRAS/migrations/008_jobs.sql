@@ -0,0 +1,22 @@
+-- Background job table behind BACKGROUND_JOBS: uploads and re-grades run on a worker
+-- thread and record their status, progress and row errors here for the dashboard to
+-- poll. database_schema.sql has always created it, but no earlier migration did.
+-- Safe to run against a database at any migration.
+USE student_result_db;
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id CHAR(32) PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL,
+    status ENUM('queued', 'running', 'done', 'failed') NOT NULL DEFAULT 'queued',
+    processed INT NOT NULL DEFAULT 0,
+    total INT NULL,
+    rows_per_sec DOUBLE NOT NULL DEFAULT 0,
+    error_count INT NOT NULL DEFAULT 0,
+    errors MEDIUMTEXT NULL,
+    message TEXT NULL,
+    created_by VARCHAR(100) NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME NULL,
+    finished_at DATETIME NULL,
+    INDEX idx_status (status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
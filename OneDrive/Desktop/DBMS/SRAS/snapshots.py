@@ -0,0 +1,116 @@
+"""
+Columnar Parquet snapshots of the students table for offline analytics.
+
+Rows are stored Hive-partitioned as semester_id=<id>/branch_id=<id>/part-*.parquet
+under one directory, so pyarrow, pandas, DuckDB or Spark can read them directly.
+Each semester is rewritten as a whole and the files of every semester are listed
+in _manifest.json together with the data version the semester was built at:
+readers go through the manifest, so a rewrite is never seen half-done, and the
+app compares those versions with the per-semester stamps in app_state to tell
+whether a semester is current. Reads are memory-mapped and only open the
+partitions a filter selects. Needs the optional `pyarrow` package.
+"""
+import json
+import os
+import threading
+import uuid
+
+import pandas as pd
+
+# Stored columns; semester_id and branch_id come from the partition directories
+SNAPSHOT_COLUMNS = ['id', 'roll_number', 'name', 'subject_id', 'marks', 'grade', 'grade_point']
+PARTITION_COLUMNS = ['semester_id', 'branch_id']
+
+
+class SnapshotStore:
+    """Per-semester Parquet partitions of students under root, listed in root/_manifest.json"""
+
+    def __init__(self, root):
+        import pyarrow as pa
+        self.root = root
+        self.manifest_path = os.path.join(root, '_manifest.json')
+        self.schema = pa.schema([('id', pa.int64()), ('roll_number', pa.string()), ('name', pa.string()),
+                                 ('subject_id', pa.int32()), ('marks', pa.float64()), ('grade', pa.string()),
+                                 ('grade_point', pa.int32())])
+        self.partition_schema = pa.schema([('semester_id', pa.int32()), ('branch_id', pa.int32())])
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return {int(semester_id): entry for semester_id, entry in json.load(f)['semesters'].items()}
+        except FileNotFoundError:
+            return {}
+
+    def versions(self):
+        """Data version each semester's snapshot was built at"""
+        return {semester_id: entry['version'] for semester_id, entry in self.manifest().items()}
+
+    def write_semester(self, semester_id, rows, version):
+        """
+        Replace a semester's snapshot with rows (SNAPSHOT_COLUMNS plus branch_id),
+        recording the data version they were read at. Other processes may rewrite
+        the manifest concurrently; a lost entry only makes that semester look stale.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        tag = f'{version}-{uuid.uuid4().hex[:8]}'
+        files = []
+        for branch_id, group in rows.sort_values(['subject_id', 'marks']).groupby('branch_id'):
+            path = os.path.join(f'semester_id={semester_id}', f'branch_id={int(branch_id)}', f'part-{tag}.parquet')
+            os.makedirs(os.path.join(self.root, os.path.dirname(path)), exist_ok=True)
+            table = pa.Table.from_pandas(group[SNAPSHOT_COLUMNS].astype({'marks': float}),
+                                         schema=self.schema, preserve_index=False)
+            pq.write_table(table, os.path.join(self.root, path), compression='zstd')
+            files.append(path)
+
+        with self._lock:
+            manifest = self.manifest()
+            old = manifest.get(semester_id, {}).get('files', [])
+            manifest[semester_id] = {'version': version, 'files': files}
+            temporary = f'{self.manifest_path}.{uuid.uuid4().hex[:8]}'
+            with open(temporary, 'w') as f:
+                json.dump({'semesters': {str(key): entry for key, entry in sorted(manifest.items())}}, f)
+            os.replace(temporary, self.manifest_path)
+        for path in set(old) - set(files):
+            try:
+                os.remove(os.path.join(self.root, path))
+            except OSError:
+                # Still open by a reader on Windows, or already gone; the next rewrite retries
+                pass
+
+    def read(self, columns, filters=None):
+        """
+        DataFrame of the given columns for rows matching filters, a dict of column
+        to value. Partition filters (semester_id, branch_id) skip whole files; a
+        value of None matches nothing.
+        """
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+        from pyarrow import fs
+
+        filters = filters or {}
+        manifest = self.manifest()
+        if 'semester_id' in filters:
+            manifest = {key: entry for key, entry in manifest.items() if key == filters['semester_id']}
+        files = [os.path.join(self.root, path) for entry in manifest.values() for path in entry['files']]
+        if not files or any(value is None for value in filters.values()):
+            return pd.DataFrame(columns=columns)
+
+        dataset = ds.dataset(files, format='parquet', filesystem=fs.LocalFileSystem(use_mmap=True),
+                             partitioning=ds.partitioning(self.partition_schema, flavor='hive'),
+                             partition_base_dir=self.root)
+        expression = None
+        for column, value in filters.items():
+            condition = pc.field(column) == value
+            expression = condition if expression is None else expression & condition
+        return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def create_snapshot_store(config):
+    """SnapshotStore at SNAPSHOT_DIR, or None when snapshots are off"""
+    if config.get('SNAPSHOT_DIR'):
+        return SnapshotStore(config['SNAPSHOT_DIR'])
+    return None
@@ -0,0 +1,106 @@
+"""
+Cohort statistics on mark arrays, and a mergeable mark sketch.
+
+describe_marks() works on the exact marks of one cohort. MarkSketch summarises a
+cohort as counts of marks per SKETCH_STEP-wide bucket over 0-100; two sketches
+merge by adding their counts, so statistics over any union of cohorts (a branch,
+a semester, the whole university) come from the stored per-(semester, subject,
+branch) sketches without reading individual marks. Marks are bounded, so the
+sketch is a fixed grid rather than an adaptive t-digest/KLL: its size never
+grows, merging is exact, and pass rates and histogram counts are exact. Marks
+on the grid (whole and half marks) are represented exactly; any other mark
+counts as the bucket's lower bound, so quantiles, the mean and the standard
+deviation are then at most SKETCH_STEP low.
+"""
+import numpy as np
+
+MAX_MARKS = 100
+SKETCH_STEP = 0.5
+SKETCH_SIZE = int(MAX_MARKS / SKETCH_STEP) + 1
+PASS_MARK = 40
+HISTOGRAM_EDGES = np.arange(0, MAX_MARKS + 1, 10)
+QUANTILES = {'q1': 0.25, 'median': 0.5, 'q3': 0.75, 'p90': 0.9}
+
+
+def sketch_buckets(marks):
+    """Bucket of each valid mark, matching FLOOR(marks / SKETCH_STEP) in SQL"""
+    return np.floor(np.asarray(marks, dtype=float) / SKETCH_STEP).astype(np.int64)
+
+
+def _summary(count, mean, std, minimum, maximum, quantiles, passed, histogram):
+    if not count:
+        return {'count': 0}
+    summary = {
+        'count': int(count),
+        'mean': round(float(mean), 2),
+        'std': round(float(std), 2),
+        'min': round(float(minimum), 2),
+        'max': round(float(maximum), 2),
+        'pass_rate': round(float(passed) / count * 100, 2),
+        'histogram': {'edges': HISTOGRAM_EDGES.tolist(), 'counts': [int(c) for c in histogram]},
+    }
+    summary.update({name: round(float(value), 2) for name, value in zip(QUANTILES, quantiles)})
+    return summary
+
+
+def describe_marks(marks):
+    """Exact statistics of a cohort's marks; absent (-1) and invalid marks are ignored"""
+    marks = np.asarray(marks, dtype=float)
+    marks = marks[(marks >= 0) & (marks <= MAX_MARKS)]
+    if not marks.size:
+        return {'count': 0}
+    return _summary(marks.size, marks.mean(), marks.std(), marks.min(), marks.max(),
+                    np.percentile(marks, [q * 100 for q in QUANTILES.values()]),
+                    np.count_nonzero(marks >= PASS_MARK), np.histogram(marks, HISTOGRAM_EDGES)[0])
+
+
+class MarkSketch:
+    """Counts of valid marks per SKETCH_STEP bucket; add sketches with + to merge them"""
+
+    values = np.arange(SKETCH_SIZE) * SKETCH_STEP
+
+    def __init__(self, counts=None):
+        self.counts = np.zeros(SKETCH_SIZE, dtype=np.int64) if counts is None else counts
+
+    @classmethod
+    def from_marks(cls, marks):
+        marks = np.asarray(marks, dtype=float)
+        marks = marks[(marks >= 0) & (marks <= MAX_MARKS)]
+        return cls(np.bincount(sketch_buckets(marks), minlength=SKETCH_SIZE).astype(np.int64))
+
+    @classmethod
+    def from_buckets(cls, buckets, counts):
+        """Sketch from stored (bucket, count) pairs"""
+        sketch = cls()
+        np.add.at(sketch.counts, np.asarray(buckets, dtype=np.int64), np.asarray(counts, dtype=np.int64))
+        return sketch
+
+    def __add__(self, other):
+        return MarkSketch(self.counts + other.counts)
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def quantile(self, qs):
+        """Quantiles with numpy's default linear interpolation between order statistics"""
+        n = self.count
+        cumulative = np.cumsum(self.counts)
+        positions = np.asarray(qs, dtype=float) * (n - 1)
+        lower = np.floor(positions)
+        # The k-th smallest mark (0-based) sits in the first bucket whose running count exceeds k
+        below = self.values[np.searchsorted(cumulative, lower, side='right')]
+        above = self.values[np.searchsorted(cumulative, np.minimum(lower + 1, n - 1), side='right')]
+        return below + (positions - lower) * (above - below)
+
+    def describe(self):
+        n = self.count
+        if not n:
+            return {'count': 0}
+        mean = float(self.counts @ self.values) / n
+        std = float(np.sqrt(self.counts @ (self.values - mean) ** 2 / n))
+        present = np.flatnonzero(self.counts)
+        histogram = np.histogram(self.values, HISTOGRAM_EDGES, weights=self.counts)[0]
+        return _summary(n, mean, std, self.values[present[0]], self.values[present[-1]],
+                        self.quantile(list(QUANTILES.values())),
+                        self.counts[self.values >= PASS_MARK].sum(), histogram)